@@ -0,0 +1,83 @@
+# benchmarks/bench_merge.py
+"""
+Benchmark del merge de db.merge_rows.
+
+Genera N OTs sintéticas, las carga en una BD vacía y después repite el merge
+sobre la BD poblada con un 5% de filas modificadas y un 5% de filas nuevas.
+Muestra el tiempo por fila para comprobar que el coste crece de forma lineal.
+
+Uso:
+    python -m benchmarks.bench_merge [10000 50000 100000 500000]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from db import get_manager, merge_rows
+
+DEFAULT_SIZES = (10_000, 50_000, 100_000, 500_000)
+
+
+def synthetic_rows(n: int, offset: int = 0, variant: str = ""):
+    for i in range(offset, offset + n):
+        yield (
+            f"OT{i:08d}",
+            f"Reparación equipo {i % 977}{variant}",
+            f"SN {i * 7919 % 10_000_000:07d}",
+            f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            f"CLIENTE {i % 150}",
+            "REPARACION",
+            ("PENDIENTE", "EN CURSO", "TERMINADA")[i % 3],
+            "LAB-BAD",
+        )
+
+
+def bench_size(n: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix="maximo-bench-") as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+
+        t0 = time.perf_counter()
+        result = merge_rows(synthetic_rows(n), db_path=db_path)
+        t_empty = time.perf_counter() - t0
+        assert (result.new_entries, result.updated_entries) == (n, 0)
+
+        # 90% iguales, 5% modificadas, 5% nuevas
+        changed = n // 20
+        rows = list(synthetic_rows(n - changed))
+        rows[:changed] = synthetic_rows(changed, variant=" (mod)")
+        rows.extend(synthetic_rows(changed, offset=n))
+
+        t0 = time.perf_counter()
+        result = merge_rows(rows, db_path=db_path)
+        t_populated = time.perf_counter() - t0
+        assert (result.new_entries, result.updated_entries) == (changed, changed)
+        get_manager(db_path).close()
+
+    return {"rows": n, "empty_s": t_empty, "populated_s": t_populated}
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.WARNING)
+    sizes = [int(a) for a in (argv or [])] or list(DEFAULT_SIZES)
+
+    print(f"{'filas':>10} {'vacía (s)':>10} {'µs/fila':>8} {'poblada (s)':>12} {'µs/fila':>8}")
+    results = []
+    for n in sizes:
+        r = bench_size(n)
+        results.append(r)
+        print(
+            f"{n:>10} {r['empty_s']:>10.2f} {r['empty_s'] / n * 1e6:>8.2f} "
+            f"{r['populated_s']:>12.2f} {r['populated_s'] / n * 1e6:>8.2f}"
+        )
+
+    # Lineal: el coste por fila del mayor tamaño no debería dispararse respecto al menor
+    first, last = results[0], results[-1]
+    ratio = (last["populated_s"] / last["rows"]) / (first["populated_s"] / first["rows"])
+    print(f"Relación coste/fila {last['rows']} vs {first['rows']}: {ratio:.2f}x")
+    return 0 if ratio < 3 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,148 @@
+# benchmarks/bench_startup.py
+"""
+Benchmark del arranque en frío de gui_main.
+
+Cada medida se hace en un proceso nuevo:
+  - python -X importtime -c "import gui_main": tiempo de import y comprobación
+    de que no se cargan módulos pesados (pandas, numpy, selenium, lxml) antes
+    de pintar la ventana.
+  - Tiempo hasta que la primera búsqueda de MaximoApp rellena la tabla desde
+    SQLite (primer set_source). Necesita pantalla; sin ella se omite.
+
+Sale con código 1 si se carga algún módulo pesado o si la mediana supera el
+presupuesto.
+
+Uso:
+    python -m benchmarks.bench_startup [--runs 5] [--budget-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Módulos que solo deben cargarse al sincronizar o abrir una OT
+HEAVY_MODULES = ("pandas", "numpy", "selenium", "lxml")
+
+DEFAULT_RUNS = 5
+DEFAULT_BUDGET_MS = 1500
+
+FIRST_PAINT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import gui_main
+import virtual_table
+marks = {"import_ms": (time.perf_counter() - t0) * 1000}
+original = virtual_table.VirtualTreeview.set_source
+def set_source(self, *args, **kwargs):
+    original(self, *args, **kwargs)
+    marks.setdefault("first_update_table_ms", (time.perf_counter() - t0) * 1000)
+virtual_table.VirtualTreeview.set_source = set_source
+try:
+    app = gui_main.MaximoApp()
+except Exception as e:  # sin pantalla (TclError)
+    marks["error"] = f"{type(e).__name__}: {e}"
+else:
+    # La búsqueda corre en segundo plano: esperamos a que llegue a la tabla
+    deadline = time.perf_counter() + 30
+    while "first_update_table_ms" not in marks and time.perf_counter() < deadline:
+        app.update()
+        time.sleep(0.005)
+    if "first_update_table_ms" not in marks:
+        marks["error"] = "la tabla no se ha rellenado en 30 s"
+    app.destroy()
+marks["heavy"] = sorted(m for m in sys.modules if m.split(".")[0] in HEAVY)
+print("STARTUP " + json.dumps(marks))
+"""
+
+
+def _run(args, cwd):
+    env = dict(os.environ, PYTHONPATH=str(ROOT_DIR))
+    return subprocess.run(
+        [sys.executable, *args], cwd=cwd, env=env,
+        capture_output=True, text=True, encoding="utf-8", errors="replace",
+    )
+
+
+def parse_importtime(stderr: str) -> dict:
+    """{módulo: tiempo acumulado en ms} a partir de la salida de -X importtime."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # cabecera
+        modules[parts[2].strip()] = int(parts[1]) / 1000
+    return modules
+
+
+def measure_imports(cwd) -> dict:
+    proc = _run(["-X", "importtime", "-c", "import gui_main"], cwd)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import gui_main ha fallado:\n{proc.stderr[-2000:]}")
+    modules = parse_importtime(proc.stderr)
+    heavy = sorted(m for m in modules if m.split(".")[0] in HEAVY_MODULES)
+    slowest = sorted(
+        ((name, ms) for name, ms in modules.items() if "." not in name.strip()),
+        key=lambda item: item[1], reverse=True,
+    )[:10]
+    return {"gui_main_ms": modules.get("gui_main"), "heavy": heavy, "slowest": slowest}
+
+
+def measure_first_paint(cwd) -> dict:
+    probe = f"HEAVY = {HEAVY_MODULES!r}\n" + FIRST_PAINT_PROBE
+    proc = _run(["-c", probe], cwd)
+    for line in proc.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            return json.loads(line[len("STARTUP "):])
+    raise RuntimeError(f"La sonda de arranque ha fallado:\n{proc.stderr[-2000:]}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="mediana máxima hasta la tabla rellena")
+    args = parser.parse_args(argv)
+
+    ok = True
+    # Directorio de trabajo temporal: gui_main crea maximo_client.log en el cwd
+    with tempfile.TemporaryDirectory(prefix="maximo-bench-") as cwd:
+        imports = [measure_imports(cwd) for _ in range(args.runs)]
+        import_ms = statistics.median(r["gui_main_ms"] for r in imports)
+        print(f"import gui_main: mediana {import_ms:.0f} ms ({args.runs} ejecuciones)")
+        print("  módulos más lentos:")
+        for name, ms in imports[-1]["slowest"]:
+            print(f"    {ms:8.1f} ms  {name}")
+        heavy = sorted({m for r in imports for m in r["heavy"]})
+        if heavy:
+            ok = False
+            print(f"FALLO: el import de gui_main carga módulos pesados: {', '.join(heavy)}")
+
+        paints = [measure_first_paint(cwd) for _ in range(args.runs)]
+        errors = [p["error"] for p in paints if "error" in p]
+        if errors:
+            print(f"tabla rellena: omitido ({errors[0]})")
+        else:
+            paint_ms = statistics.median(p["first_update_table_ms"] for p in paints)
+            print(f"tabla rellena: mediana {paint_ms:.0f} ms (presupuesto {args.budget_ms:.0f} ms)")
+            if paint_ms > args.budget_ms:
+                ok = False
+                print("FALLO: el arranque supera el presupuesto")
+            heavy = sorted({m for p in paints for m in p["heavy"]})
+            if heavy:
+                ok = False
+                print(f"FALLO: al pintar la ventana ya están cargados: {', '.join(heavy)}")
+
+    print("OK" if ok else "REGRESIÓN")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
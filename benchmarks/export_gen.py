@@ -0,0 +1,90 @@
+# benchmarks/export_gen.py
+"""
+Generador de exports sintéticos de Maximo (HTML con extensión .xls).
+
+Imita el listado real: fila de título, fila de cabecera con 16 columnas en las
+posiciones del export (LEGACY_POSITIONS), fechas "dd/mm/yy HH:MM:SS", &nbsp; y
+espacios sobrantes en OT y cliente, algo de marcado dentro de las celdas y
+muchos clientes distintos.
+
+Uso:
+    python -m benchmarks.export_gen salida.xls 100000
+"""
+import random
+import sys
+from html import escape
+
+# Cabecera del export: las columnas que no usa la app llevan su nombre real aproximado
+EXPORT_COLUMNS = (
+    "OT", "Estado", "Fecha", "Cliente", "Prioridad", "Seguimiento", "Activo",
+    "Ubicación", "Responsable", "Tipo de trabajo", "Grupo", "Supervisor",
+    "Descripción", "Planta", "Contrato", "Nº de serie",
+)
+
+SEGUIMIENTOS = ("PENDIENTE", "EN CURSO", "ESPERA MATERIAL", "TERMINADA", "CERRADA")
+TIPOS_TRABAJO = ("CM", "PM", "REPARACION", "CALIBRACION", "INSPECCION")
+PLANTAS = ("LAB-BAD", "LAB-MAD", "LAB-SEV")
+EQUIPOS = ("Bomba", "Compresor", "Radar", "Fuente", "Osciloscopio", "Módulo", "Tarjeta", "Antena")
+AVERIAS = ("no arranca", "sin señal", "ruido excesivo", "calibración vencida",
+           "revisión anual", "fallo intermitente", "pantalla dañada", "sobretemperatura")
+
+
+def _noisy(value: str, rng: random.Random) -> str:
+    """Texto HTML con el ruido del export real (NBSP y espacios sobrantes)."""
+    value = escape(value)
+    roll = rng.random()
+    if roll < 0.15:
+        return value + "&nbsp;"
+    if roll < 0.25:
+        return "  " + value.replace(" ", "&nbsp; ", 1) + " "
+    return value
+
+
+def export_rows(n: int, seed: int = 0, clients: int = 2000, first_ot: int = 100_000):
+    """Celdas (texto HTML) de n filas del export, en el orden de EXPORT_COLUMNS."""
+    rng = random.Random(seed)
+    for i in range(n):
+        ot = str(first_ot + i)
+        day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.randint(18, 25)
+        date = f"{day:02d}/{month:02d}/{year:02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+        description = f"{rng.choice(EQUIPOS)} {rng.randint(1, 999)} {rng.choice(AVERIAS)}"
+        if rng.random() < 0.05:
+            description = f"<b>URGENTE</b> {escape(description)}"
+        else:
+            description = escape(description)
+        yield (
+            _noisy(ot, rng),
+            rng.choice(("APPR", "WAPPR", "INPRG", "COMP")),
+            date,
+            _noisy(f"CLIENTE {rng.randint(1, clients)} S.A.", rng),
+            str(rng.randint(1, 4)),
+            rng.choice(SEGUIMIENTOS),
+            f"ACT-{rng.randint(1, 50_000):06d}",
+            "",
+            "",
+            rng.choice(TIPOS_TRABAJO),
+            "",
+            "",
+            description,
+            rng.choice(PLANTAS),
+            "",
+            _noisy(f"SN {rng.randint(0, 9_999_999):07d}", rng),
+        )
+
+
+def write_export(path, n: int, seed: int = 0, clients: int = 2000, first_ot: int = 100_000):
+    """Escribe en path un export de n filas y devuelve path."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<html><head><meta charset="utf-8"></head><body>\n<table>\n')
+        f.write(f'<tr><th colspan="{len(EXPORT_COLUMNS)}">Órdenes de trabajo</th></tr>\n')
+        f.write("<tr>" + "".join(f"<th>{escape(c)}</th>" for c in EXPORT_COLUMNS) + "</tr>\n")
+        for cells in export_rows(n, seed=seed, clients=clients, first_ot=first_ot):
+            f.write("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>\n")
+        f.write("</table>\n</body></html>\n")
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit(__doc__)
+    write_export(sys.argv[1], int(sys.argv[2]))
@@ -0,0 +1,272 @@
+# benchmarks/suite.py
+"""
+Suite de benchmarks de los caminos críticos de la app sobre un export sintético.
+
+Mide:
+  - parse_export / process_html_table: lectura del export (HTML .xls).
+  - merge_empty / merge_populated: update_database_from_df (o merge_rows si
+    no está pandas) sobre una BD vacía y sobre la BD ya poblada con un 5% de
+    filas modificadas y un 5% nuevas.
+  - fetch_*: búsquedas típicas de la pestaña de listado (mediana de --repeat).
+  - treeview_*: carga y scroll del VirtualTreeview (necesita pantalla).
+
+Los resultados se guardan en JSON; con --baseline se comparan con unos
+resultados anteriores y se marcan como regresión los casos más lentos que
+baseline * --threshold.
+
+Uso:
+    python -m benchmarks.suite --rows 100000 --output resultados.json
+    python -m benchmarks.suite --rows 100000 --baseline resultados.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.export_gen import write_export
+from db import MAXIMO_COLUMNS, QueryPager, count_data, fetch_data, get_manager, merge_rows, update_database_from_df
+from export_parser import iter_export_rows
+
+DEFAULT_ROWS = 10_000
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 1.25
+# Diferencias menores que esto son ruido (consultas de menos de 1 ms)
+DEFAULT_MIN_DELTA_MS = 5.0
+
+# (nombre, kwargs de fetch_data) con las búsquedas habituales del listado
+FETCH_CASES = (
+    ("fetch_first_page", dict(filter_text="", search_by="OT", client_filter="Todos",
+                              order_by="OT", descending=True, limit=200)),
+    ("fetch_deep_page", dict(filter_text="", search_by="OT", client_filter="Todos",
+                             order_by="OT", descending=True, limit=200, offset=None)),
+    ("fetch_word", dict(filter_text="bomba", search_by="Descripción", client_filter="Todos",
+                        order_by="OT", descending=True, limit=200)),
+    ("fetch_two_words", dict(filter_text="radar señal", search_by="Descripción", client_filter="Todos",
+                             order_by="OT", descending=True, limit=200)),
+    ("fetch_short_term", dict(filter_text="12", search_by="OT", client_filter="Todos",
+                              order_by="OT", descending=True, limit=200)),
+    ("fetch_serial", dict(filter_text="4567", search_by="Nº_de_serie", client_filter="Todos",
+                          order_by="OT", descending=True, limit=200)),
+    ("fetch_client_by_date", dict(filter_text="", search_by="OT", client_filter="CLIENTE 7 S.A.",
+                                  order_by="Fecha", descending=True, limit=200)),
+    ("fetch_client_date_range", dict(filter_text="", search_by="OT", client_filter="CLIENTE 7 S.A.",
+                                     date_from="2024-01-01", date_to="2024-12-31",
+                                     order_by="Fecha", descending=True, limit=200)),
+    ("fetch_date_range", dict(filter_text="", search_by="OT", client_filter="Todos",
+                              date_from="2025-06-01", date_to="2025-06-30",
+                              order_by="Fecha", descending=True, limit=200)),
+)
+
+
+def _median_time(fn, repeat: int) -> float:
+    fn()  # calentamiento: caché de páginas de SQLite
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def _populated_variant(rows: list, n: int) -> list:
+    """90% iguales, 5% modificadas y 5% nuevas."""
+    changed = max(1, n // 20)
+    variant = list(rows[: n - changed])
+    for i in range(changed):
+        row = list(variant[i])
+        row[1] = row[1] + " (mod)"
+        variant[i] = tuple(row)
+    last_ot = max(int(r[0]) for r in rows)
+    for i in range(changed):
+        row = list(rows[i])
+        row[0] = str(last_ot + 1 + i)
+        variant.append(tuple(row))
+    return variant
+
+
+def bench_parse(export_path: str, results: dict) -> list:
+    t0 = time.perf_counter()
+    rows = list(iter_export_rows(export_path))
+    results["parse_export"] = {"seconds": time.perf_counter() - t0, "rows": len(rows)}
+
+    try:
+        from maximo_client import process_html_table
+    except ImportError as e:  # selenium / pandas no instalados
+        results["process_html_table"] = {"skipped": str(e)}
+    else:
+        t0 = time.perf_counter()
+        process_html_table(export_path)
+        results["process_html_table"] = {"seconds": time.perf_counter() - t0, "rows": len(rows)}
+    return rows
+
+
+def bench_merge(rows: list, db_path: str, results: dict):
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    def merge(data):
+        if pd is None:
+            return merge_rows(data, db_path=db_path)
+        return update_database_from_df(pd.DataFrame(data, columns=list(MAXIMO_COLUMNS)), db_path=db_path)
+
+    function = "merge_rows" if pd is None else "update_database_from_df"
+    t0 = time.perf_counter()
+    result = merge(rows)
+    results["merge_empty"] = {"seconds": time.perf_counter() - t0, "rows": len(rows),
+                              "new": result.new_entries, "updated": result.updated_entries,
+                              "function": function}
+
+    variant = _populated_variant(rows, len(rows))
+    t0 = time.perf_counter()
+    result = merge(variant)
+    results["merge_populated"] = {"seconds": time.perf_counter() - t0, "rows": len(variant),
+                                  "new": result.new_entries, "updated": result.updated_entries,
+                                  "function": function}
+
+
+def bench_fetch(db_path: str, repeat: int, results: dict):
+    total = count_data("", "OT", "Todos", db_path=db_path)
+    for name, query in FETCH_CASES:
+        query = dict(query, db_path=db_path)
+        if "offset" in query:
+            query["offset"] = max(0, total // 2)
+        seconds = _median_time(lambda: fetch_data(**query), repeat)
+        results[name] = {"seconds": seconds, "rows": len(fetch_data(**query))}
+
+    results["count_word"] = {
+        "seconds": _median_time(lambda: count_data("bomba", "Descripción", "Todos", db_path=db_path), repeat)
+    }
+
+
+def bench_treeview(db_path: str, results: dict):
+    import tkinter as tk
+    from virtual_table import VirtualTreeview
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:  # sin pantalla
+        results["treeview_load"] = {"skipped": str(e)}
+        return
+    try:
+        root.geometry("1600x800")
+        table = VirtualTreeview(root, columns=MAXIMO_COLUMNS)
+        table.pack(fill="both", expand=True)
+        root.update()
+
+        query = dict(filter_text="", search_by="OT", client_filter="Todos",
+                     order_by="OT", descending=True, db_path=db_path)
+        t0 = time.perf_counter()
+        table.set_source(count_data("", "OT", "Todos", db_path=db_path), QueryPager(table.page_size, **query))
+        root.update()
+        results["treeview_load"] = {"seconds": time.perf_counter() - t0}
+
+        pages = 50
+        t0 = time.perf_counter()
+        for _ in range(pages):
+            table._on_scrollbar("scroll", "1", "pages")
+            root.update()
+        results["treeview_scroll"] = {"seconds": time.perf_counter() - t0, "pages": pages}
+    finally:
+        root.destroy()
+
+
+def run(rows: int, repeat: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="maximo-bench-") as tmp:
+        export_path = write_export(os.path.join(tmp, "export.xls"), rows)
+        db_path = os.path.join(tmp, "bench.db")
+
+        parsed = bench_parse(export_path, results)
+        bench_merge(parsed, db_path, results)
+        bench_fetch(db_path, repeat, results)
+        bench_treeview(db_path, results)
+        get_manager(db_path).close()
+
+    return {
+        "meta": {
+            "rows": rows,
+            "repeat": repeat,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float,
+            min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> list:
+    """Nombres de los casos más lentos que baseline * threshold (y al menos min_delta_ms)."""
+    if current["meta"]["rows"] != baseline["meta"]["rows"]:
+        print(f"Aviso: baseline con {baseline['meta']['rows']} filas, "
+              f"resultados actuales con {current['meta']['rows']}")
+    regressions = []
+    print(f"{'caso':<24} {'baseline (ms)':>14} {'actual (ms)':>12} {'ratio':>7}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name, {})
+        if "seconds" not in result or "seconds" not in base:
+            continue
+        ratio = result["seconds"] / base["seconds"] if base["seconds"] else float("inf")
+        flag = ""
+        delta_ms = (result["seconds"] - base["seconds"]) * 1000
+        if ratio > threshold and delta_ms > min_delta_ms:
+            regressions.append(name)
+            flag = "  REGRESIÓN"
+        print(f"{name:<24} {base['seconds'] * 1000:>14.1f} {result['seconds'] * 1000:>12.1f} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def _print_results(report: dict):
+    print(f"{'caso':<24} {'ms':>10}  detalle")
+    for name, result in report["results"].items():
+        if "skipped" in result:
+            print(f"{name:<24} {'-':>10}  omitido ({result['skipped']})")
+            continue
+        extra = ", ".join(f"{k}={v}" for k, v in result.items() if k != "seconds")
+        print(f"{name:<24} {result['seconds'] * 1000:>10.1f}  {extra}")
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Benchmarks de la app sobre un export sintético")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="filas del export (10k - 1M)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="repeticiones de las búsquedas")
+    parser.add_argument("--output", help="guarda los resultados en este JSON")
+    parser.add_argument("--baseline", help="JSON de resultados anteriores con el que comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="ratio a partir del cual un caso es regresión")
+    parser.add_argument("--min-delta-ms", type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="diferencia mínima (ms) para considerar regresión")
+    args = parser.parse_args(argv)
+
+    report = run(args.rows, args.repeat)
+    _print_results(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"REGRESIÓN en: {', '.join(regressions)}")
+            return 1
+        print("OK: sin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
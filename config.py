@@ -1,6 +1,10 @@
 # config.py
+import atexit
+import copy
 import json
 import os
+import tempfile
+import threading
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import sys
@@ -37,9 +41,58 @@ class AppConfig:
 
     auto_update_enabled: bool = False
     auto_update_interval_min: int = 10
+    # Intervalo adaptativo: se acorta si la última sincronización trajo cambios
+    # y se alarga si no, entre estos límites (minutos)
+    auto_update_adaptive: bool = True
+    auto_update_min_interval_min: int = 2
+    auto_update_max_interval_min: int = 60
+    # Primer reintento tras un fallo (luego se dobla, con jitter, hasta el máximo)
+    auto_update_retry_sec: int = 30
+    # Abrir OT: aplicación de Maximo a la que apunta el enlace directo a una OT
+    ot_link_app: str = "WO_TR"
+    ot_deep_link_enabled: bool = True
+    # Abrir OT: navegadores visibles con sesión iniciada, precalentados al arrancar
+    ot_pool_prewarm: int = 1
+    ot_pool_idle_timeout_min: int = 30
+    # Auto-update: mantener un Edge headless con la sesión iniciada entre ticks
+    persistent_sync_session: bool = True
+
+    # Esperas de Selenium (segundos): máximo a esperar en cada paso / descarga
+    wait_timeout_sec: int = 60
+    download_timeout_sec: int = 180
 
     # Filtros por defecto (se usan en apply_filter)
     filters: dict | None = None
+    # Perfiles de filtro con nombre {"LAB-BAD": {id_campo: valor}, ...}: cada uno
+    # es un export distinto. Vacío = un único perfil con `filters`.
+    filter_profiles: dict | None = None
+    # Navegadores que exportan perfiles en paralelo
+    sync_workers: int = 2
+
+    # Backend de sincronización: "selenium" (export desde Edge) o "rest" (API OSLC)
+    sync_backend: str = "selenium"
+    rest_object_structure: str = "mxwo"
+    rest_page_size: int = 500
+    rest_timeout_sec: int = 60
+    # Sincronización incremental (REST): solo OT cambiadas desde la marca de agua,
+    # con una sincronización completa (que también elimina OT borradas) cada X horas
+    delta_sync_enabled: bool = True
+    full_sync_interval_hours: int = 24
+    full_sync_deletes_missing: bool = True
+    rest_change_field: str = "changedate"
+    # Columna de la BD -> atributo del object structure
+    rest_field_map: dict | None = None
+    # Mismo filtro que `filters`, por columna de la BD ("=X" exacto, "X" contiene)
+    rest_filters: dict | None = None
+
+    # Servicio sin GUI (sync_service.py): API JSON de solo lectura
+    api_host: str = "127.0.0.1"
+    api_port: int = 8765
+
+    # Métricas por fases de cada sincronización (JSON lines y, opcional, textfile de Prometheus)
+    metrics_enabled: bool = True
+    metrics_file: str = str(DATA_DIR / "sync_metrics.jsonl")
+    metrics_prometheus_file: str = ""
 
     # Para la barra de estado persistente
     last_status: dict | None = None
@@ -54,27 +107,119 @@ class AppConfig:
             self.filters = {
                 "mx38_tfrow_[C:26]_txt-tb": "=LAB-BAD"  # valor filtro planta = LAB-BDN
             }
+        if self.rest_field_map is None:
+            self.rest_field_map = {
+                "OT": "wonum",
+                "Descripción": "description",
+                "Nº_de_serie": "assetnum",
+                "Fecha": "reportdate",
+                "Cliente": "pluscustomer",
+                "Tipo_de_trabajo": "worktype",
+                "Seguimiento": "status",
+                "Planta": "location",
+            }
+        if self.rest_filters is None:
+            self.rest_filters = {"Planta": "=LAB-BAD"}
 
 
-def load_config() -> AppConfig:
-    if os.path.exists(CONFIG_PATH):
-        with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+class ConfigStore:
+    """
+    Configuración en memoria compartida por todo el proceso.
+
+    - get() solo vuelve a leer config.json si su mtime ha cambiado.
+    - save() actualiza la copia en memoria y agrupa las escrituras a disco
+      (debounce); flush() escribe ya. La escritura es atómica: fichero temporal
+      en la misma carpeta + os.replace().
+    - Devuelve siempre copias: quien modifica un AppConfig debe llamar a save().
+    """
+
+    def __init__(self, path: str, save_delay_s: float = 0.5):
+        self.path = path
+        self.save_delay_s = save_delay_s
+        self._lock = threading.RLock()
+        self._cfg: AppConfig | None = None
+        self._mtime_ns: int | None = None
+        self._dirty = False
+        self._timer: threading.Timer | None = None
+
+    def _file_mtime_ns(self) -> int | None:
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read(self) -> AppConfig:
+        with open(self.path, "r", encoding="utf-8") as f:
             data = json.load(f)
-        # Merge con defaults por si faltan claves
-        base = AppConfig()
-        base_dict = asdict(base)
-        base_dict.update(data)
+        # Merge con defaults por si faltan claves (e ignorando claves obsoletas)
+        base_dict = asdict(AppConfig())
+        base_dict.update({k: v for k, v in data.items() if k in base_dict})
         return AppConfig(**base_dict)
-    else:
-        cfg = AppConfig()
-        save_config(cfg)
-        return cfg
+
+    def get(self) -> AppConfig:
+        with self._lock:
+            mtime = self._file_mtime_ns()
+            if self._cfg is None or (not self._dirty and mtime != self._mtime_ns):
+                if mtime is None:
+                    self._cfg = AppConfig()
+                    self._dirty = True
+                    self.flush()
+                else:
+                    self._cfg = self._read()
+                    self._mtime_ns = mtime
+            return copy.deepcopy(self._cfg)
+
+    def save(self, cfg: AppConfig):
+        with self._lock:
+            self._cfg = copy.deepcopy(cfg)
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.save_delay_s, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty or self._cfg is None:
+                return
+
+            folder = os.path.dirname(self.path) or "."
+            os.makedirs(folder, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".config-", suffix=".tmp", dir=folder)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(asdict(self._cfg), f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._mtime_ns = self._file_mtime_ns()
+            self._dirty = False
+
+
+_store = ConfigStore(CONFIG_PATH)
+atexit.register(_store.flush)
+
+
+def load_config() -> AppConfig:
+    return _store.get()
 
 
 def save_config(cfg: AppConfig):
-    os.makedirs(os.path.dirname(CONFIG_PATH), exist_ok=True) if os.path.dirname(CONFIG_PATH) else None
-    with open(CONFIG_PATH, "w", encoding="utf-8") as f:
-        json.dump(asdict(cfg), f, indent=2)
+    _store.save(cfg)
+
+
+def flush_config():
+    """Escribe a disco los cambios pendientes (p. ej. al cerrar la app)."""
+    _store.flush()
 
 
 def get_credentials():
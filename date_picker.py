@@ -0,0 +1,113 @@
+# date_picker.py
+import calendar
+import tkinter as tk
+from datetime import date, datetime
+from tkinter import ttk
+from typing import Callable, Optional
+
+DISPLAY_FORMAT = "%d/%m/%Y"
+MONTH_NAMES = ("enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+               "agosto", "septiembre", "octubre", "noviembre", "diciembre")
+WEEKDAY_NAMES = ("L", "M", "X", "J", "V", "S", "D")
+
+
+class DateEntry(ttk.Frame):
+    """
+    Campo de fecha dd/mm/aaaa con un calendario desplegable (sin dependencias).
+
+    Vacío = sin fecha. on_change() se llama cuando la fecha cambia (elegida en
+    el calendario, o escrita y confirmada con Intro / al salir del campo).
+    """
+
+    def __init__(self, master, on_change: Optional[Callable[[], None]] = None, width: int = 11):
+        super().__init__(master)
+        self.on_change = on_change
+        self.var = tk.StringVar()
+        self._value: Optional[date] = None
+        self._popup: Optional[tk.Toplevel] = None
+        self._month = date.today().replace(day=1)
+
+        self.entry = ttk.Entry(self, textvariable=self.var, width=width)
+        self.entry.pack(side="left")
+        self.entry.bind("<Return>", lambda e: self._commit_text())
+        self.entry.bind("<FocusOut>", lambda e: self._commit_text())
+        ttk.Button(self, text="📅", width=3, command=self._toggle_popup).pack(side="left")
+
+    def get_date(self) -> Optional[date]:
+        return self._value
+
+    def set_date(self, value: Optional[date], notify: bool = True):
+        self.var.set(value.strftime(DISPLAY_FORMAT) if value else "")
+        changed = value != self._value
+        self._value = value
+        if changed and notify and self.on_change is not None:
+            self.on_change()
+
+    def _commit_text(self):
+        text = self.var.get().strip()
+        if not text:
+            self.set_date(None)
+            return
+        try:
+            self.set_date(datetime.strptime(text, DISPLAY_FORMAT).date())
+        except ValueError:
+            # Texto no válido: se vuelve a mostrar la última fecha buena
+            self.set_date(self._value, notify=False)
+
+    # ---------- Calendario ----------
+    def _toggle_popup(self):
+        if self._popup is not None:
+            self._close_popup()
+            return
+        self._month = (self._value or date.today()).replace(day=1)
+        self._popup = popup = tk.Toplevel(self)
+        popup.wm_overrideredirect(True)
+        popup.wm_geometry(f"+{self.winfo_rootx()}+{self.winfo_rooty() + self.winfo_height()}")
+        popup.bind("<Escape>", lambda e: self._close_popup())
+        self._render_month()
+        popup.focus_set()
+
+    def _close_popup(self):
+        if self._popup is not None:
+            self._popup.destroy()
+            self._popup = None
+
+    def _shift_month(self, delta: int):
+        index = self._month.year * 12 + self._month.month - 1 + delta
+        self._month = date(index // 12, index % 12 + 1, 1)
+        self._render_month()
+
+    def _render_month(self):
+        for child in self._popup.winfo_children():
+            child.destroy()
+        frame = ttk.Frame(self._popup, relief="solid", borderwidth=1, padding=4)
+        frame.pack()
+
+        header = ttk.Frame(frame)
+        header.grid(row=0, column=0, columnspan=7, sticky="ew")
+        ttk.Button(header, text="◀", width=3, command=lambda: self._shift_month(-1)).pack(side="left")
+        ttk.Label(
+            header, text=f"{MONTH_NAMES[self._month.month - 1]} {self._month.year}", anchor="center"
+        ).pack(side="left", expand=True, fill="x")
+        ttk.Button(header, text="▶", width=3, command=lambda: self._shift_month(1)).pack(side="left")
+
+        for column, name in enumerate(WEEKDAY_NAMES):
+            ttk.Label(frame, text=name, anchor="center").grid(row=1, column=column)
+        weeks = calendar.Calendar(firstweekday=0).monthdayscalendar(self._month.year, self._month.month)
+        for row, week in enumerate(weeks, start=2):
+            for column, day in enumerate(week):
+                if day == 0:
+                    continue
+                value = self._month.replace(day=day)
+                text = f"[{day}]" if value == self._value else str(day)
+                ttk.Button(frame, text=text, width=4, command=lambda v=value: self._pick(v)) \
+                    .grid(row=row, column=column)
+
+        footer = ttk.Frame(frame)
+        footer.grid(row=len(weeks) + 2, column=0, columnspan=7, sticky="ew", pady=(4, 0))
+        ttk.Button(footer, text="Hoy", command=lambda: self._pick(date.today())).pack(side="left")
+        ttk.Button(footer, text="Borrar", command=lambda: self._pick(None)).pack(side="right")
+
+    def _pick(self, value: Optional[date]):
+        self._close_popup()
+        self.set_date(value)
@@ -1,18 +1,253 @@
 # db.py
+import hashlib
 import sqlite3
 import logging
-from typing import List, Tuple, Optional
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from datetime import date
+from itertools import islice
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 from config import load_config
 
 
-def get_connection():
-    cfg = load_config()
-    return sqlite3.connect(cfg.db_path)
+MAXIMO_COLUMNS = (
+    "OT",
+    "Descripción",
+    "Nº_de_serie",
+    "Fecha",
+    "Cliente",
+    "Tipo_de_trabajo",
+    "Seguimiento",
+    "Planta",
+)
 
+# PRAGMA user_version desde el que las OT guardadas ya están normalizadas
+# (_normalize_stored_ots se ejecuta una sola vez por BD)
+OTS_NORMALIZED_USER_VERSION = 1
 
-def init_db():
-    conn = get_connection()
-    cur = conn.cursor()
+# Columnas indexadas para la búsqueda de texto (FTS5 trigram)
+SEARCH_COLUMNS = ("OT", "Descripción", "Nº_de_serie")
+
+# La OT se ordena como número (primero por longitud y luego como texto) y
+# desempata cuando se ordena por cualquier otra columna.
+OT_SORT_KEYS = ("length(m.OT)", "m.OT")
+
+# Índices de apoyo para ordenar / filtrar (nombre -> columnas). Siguen el mismo
+# orden que las claves de _sort_keys para que SQLite lea ya ordenado.
+MAXIMO_INDEXES = {
+    "idx_maximo_ot_num": "length(OT), OT",
+    "idx_maximo_cliente": "Cliente, length(OT), OT",
+    "idx_maximo_cliente_fecha_dia": "Cliente, Fecha_dia, length(OT), OT",
+    "idx_maximo_planta": "Planta, length(OT), OT",
+    "idx_maximo_seguimiento": "Seguimiento, length(OT), OT",
+    "idx_maximo_fecha_dia": "Fecha_dia, length(OT), OT",
+}
+
+# Fecha como número de día juliano (columna generada Fecha_dia, indexada):
+# Fecha se guarda como texto "YYYY-MM-DD" para mostrarla y Fecha_dia se usa
+# para ordenar y filtrar por rango. 0 (nunca NULL, para que la comparación del
+# keyset funcione) si Fecha está vacía o no es una fecha.
+FECHA_DIA_SQL = "ifnull(CAST(julianday(Fecha) AS INTEGER), 0)"
+# date.toordinal() + esto = Fecha_dia
+_JULIAN_DAY_OFFSET = 1721424
+
+# Hash de las columnas de datos (todas menos OT) de cada fila: el merge compara
+# este valor en vez de columna a columna. Función SQL para rellenarlo en BD antiguas.
+ROW_HASH_SQL_FUNCTION = "maximo_row_hash"
+# Filas por lote en merge_rows (parámetros de WHERE OT IN (...), < 999)
+MERGE_BATCH_SIZE = 500
+
+# Clave de sync_state que cambia cada vez que un merge modifica maximo (ETag de la API)
+STATE_DATA_VERSION = "db.data_version"
+
+# Columnas con tabla de valores (combos de la GUI)
+LOOKUP_COLUMNS = ("Cliente", "Planta", "Seguimiento")
+
+# El tokenizer trigram necesita al menos 3 caracteres por término
+FTS_MIN_TERM_LEN = 3
+
+# Ajustes de SQLite para las conexiones de la app
+BUSY_TIMEOUT_MS = 10_000
+CACHE_SIZE_KIB = 64 * 1024          # cache_size negativo = KiB
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+CHECKPOINT_INTERVAL_S = 300
+# Cada cuántas instrucciones de la VM de SQLite se comprueba si cancelar (cancel_on)
+PROGRESS_HANDLER_OPS = 1000
+
+
+class QueryCancelled(Exception):
+    """La consulta se ha abortado porque ya no hace falta (cancel_on)."""
+
+
+class _ReaderSlot:
+    """Conexión lectora guardada en el thread-local: al morir el hilo se libera el slot."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+class ConnectionManager:
+    """
+    Conexiones de larga duración a una BD SQLite en modo WAL:
+    - un único escritor compartido (serializado con un lock) para el updater,
+    - una conexión de solo lectura por hilo, reutilizada entre consultas y
+      cerrada cuando el hilo termina (p.ej. los de un ThreadPoolExecutor).
+
+    En WAL los lectores leen el último snapshot confirmado y no se bloquean
+    mientras hay una sincronización escribiendo.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._write_lock = threading.RLock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._last_checkpoint = time.monotonic()
+        self.fts_enabled: Optional[bool] = None  # lo fija init_db()
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,  # para poder cerrarlas desde on_close
+        )
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            if str(mode).lower() != "wal":
+                logging.warning(f"BD: no se pudo activar WAL (journal_mode={mode})")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.create_function(
+                ROW_HASH_SQL_FUNCTION, len(MAXIMO_COLUMNS) - 1,
+                lambda *values: row_hash(_normalize_row(values)),
+                deterministic=True,
+            )
+        return conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect(read_only=False)
+                logging.info(f"BD: conexión de escritura abierta ({self.db_path})")
+            return self._writer
+
+    @contextmanager
+    def writer(self):
+        """
+        Transacción de escritura (BEGIN IMMEDIATE ... COMMIT) en la conexión
+        compartida. Reentrante: un writer() anidado reutiliza la transacción abierta.
+        """
+        with self._write_lock:
+            conn = self._get_writer()
+            if conn.in_transaction:
+                yield conn
+                return
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+            self._maybe_checkpoint()
+
+    def reader(self) -> sqlite3.Connection:
+        """Conexión de solo lectura del hilo actual (se crea la primera vez)."""
+        slot = getattr(self._local, "slot", None)
+        if slot is None:
+            if self._writer is None:
+                self._get_writer()  # garantiza que la BD ya está en WAL
+            slot = _ReaderSlot(self._connect(read_only=True))
+            self._local.slot = slot
+            with self._readers_lock:
+                self._readers.append(slot.conn)
+            # Python suelta el thread-local cuando el hilo termina
+            weakref.finalize(slot, self._close_reader, slot.conn)
+        return slot.conn
+
+    def _close_reader(self, conn: sqlite3.Connection):
+        with self._readers_lock:
+            if conn in self._readers:
+                self._readers.remove(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _maybe_checkpoint(self):
+        if time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL_S:
+            self.checkpoint()
+
+    def checkpoint(self, mode: str = "PASSIVE"):
+        """Vuelca el WAL a la BD. PASSIVE no espera a los lectores activos."""
+        with self._write_lock:
+            busy, log_pages, done = self._get_writer().execute(
+                f"PRAGMA wal_checkpoint({mode})"
+            ).fetchone()
+            self._last_checkpoint = time.monotonic()
+        logging.debug(f"BD: checkpoint {mode} busy={busy} wal={log_pages} copiadas={done}")
+
+    def close(self):
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with self._write_lock:
+            if self._writer is not None:
+                try:
+                    self.checkpoint("TRUNCATE")
+                except sqlite3.Error:
+                    logging.warning("BD: no se pudo hacer checkpoint al cerrar", exc_info=True)
+                self._writer.close()
+                self._writer = None
+        self._local = threading.local()
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(db_path: Optional[str] = None) -> ConnectionManager:
+    """Devuelve el ConnectionManager de db_path (por defecto, cfg.db_path)."""
+    if db_path is None:
+        db_path = load_config().db_path
+    with _managers_lock:
+        manager = _managers.get(db_path)
+        if manager is None:
+            manager = _managers[db_path] = ConnectionManager(db_path)
+        return manager
+
+
+def close_all():
+    """Cierra todas las conexiones abiertas (al salir de la app)."""
+    with _managers_lock:
+        managers = list(_managers.values())
+        _managers.clear()
+    for manager in managers:
+        manager.close()
+
+
+def init_db(db_path: Optional[str] = None):
+    manager = get_manager(db_path)
+    with manager.writer() as conn:
+        cur = conn.cursor()
+        _create_schema(cur)
+        manager.fts_enabled = _create_search_index(cur)
+
+
+def _create_schema(cur):
     cur.execute("""
         CREATE TABLE IF NOT EXISTS maximo (
             OT TEXT PRIMARY KEY,
@@ -25,80 +260,612 @@ def init_db():
             Planta TEXT
         )
     """)
-    conn.commit()
-    conn.close()
+    _normalize_stored_ots(cur)
+    _migrate_fecha_dia(cur)
+    for name, columns in MAXIMO_INDEXES.items():
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON maximo ({columns})")
+    _migrate_row_hash(cur)
+    # Estado de la sincronización (marcas de agua, última sincronización completa...)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+    # Valores distintos de LOOKUP_COLUMNS, mantenidos por merge_rows
+    lookup_exists = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'maximo_lookup'"
+    ).fetchone()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS maximo_lookup (
+            kind TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (kind, value)
+        ) WITHOUT ROWID
+    """)
+    if not lookup_exists:
+        # BD anterior a la tabla: se rellena una sola vez desde maximo
+        _add_lookup_values(cur, "main.maximo")
+    # Perfiles de filtro en cuyo export aparece cada OT (merge_rows(profile=...))
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS maximo_profile (
+            profile TEXT NOT NULL,
+            OT TEXT NOT NULL,
+            PRIMARY KEY (profile, OT)
+        ) WITHOUT ROWID
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_maximo_profile_ot ON maximo_profile (OT)")
+
+
+def _migrate_fecha_dia(cur):
+    """Columna generada Fecha_dia (ver FECHA_DIA_SQL): se añade una sola vez en BD antiguas."""
+    columns = {r[1] for r in cur.execute("PRAGMA table_xinfo(maximo)")}
+    if "Fecha_dia" in columns:
+        return
+    cur.execute(
+        f"ALTER TABLE maximo ADD COLUMN Fecha_dia INTEGER GENERATED ALWAYS AS ({FECHA_DIA_SQL}) VIRTUAL"
+    )
+    # Los índices sobre el texto de Fecha los sustituyen los de Fecha_dia
+    cur.execute("DROP INDEX IF EXISTS idx_maximo_cliente_fecha")
+    cur.execute("DROP INDEX IF EXISTS idx_maximo_fecha")
+    logging.info("BD: columna Fecha_dia añadida")
+
+
+def julian_day(value) -> int:
+    """date o "YYYY-MM-DD" -> valor de Fecha_dia. ValueError si no es una fecha."""
+    if isinstance(value, str):
+        try:
+            value = date.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"Fecha no válida (YYYY-MM-DD): {value!r}") from None
+    return value.toordinal() + _JULIAN_DAY_OFFSET
+
+
+def _migrate_row_hash(cur):
+    """Columna row_hash (ver row_hash()): se añade y rellena una sola vez en BD antiguas."""
+    columns = {r[1] for r in cur.execute("PRAGMA table_info(maximo)")}
+    if "row_hash" not in columns:
+        cur.execute("ALTER TABLE maximo ADD COLUMN row_hash INTEGER")
+        data_cols = ", ".join(MAXIMO_COLUMNS[1:])
+        cur.execute(f"UPDATE maximo SET row_hash = {ROW_HASH_SQL_FUNCTION}({data_cols})")
+        if cur.rowcount:
+            logging.info(f"BD: row_hash calculado para {cur.rowcount} OT existentes")
+    # Índice cubriente (OT, row_hash): el merge detecta cambios sin leer las filas
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_maximo_ot_hash ON maximo (OT, row_hash)")
+
+
+def _add_lookup_values(cur, source: str):
+    """Añade a maximo_lookup los valores de LOOKUP_COLUMNS presentes en source."""
+    for column in LOOKUP_COLUMNS:
+        cur.execute(f"""
+            INSERT OR IGNORE INTO maximo_lookup (kind, value)
+            SELECT DISTINCT ?, {column} FROM {source} WHERE {column} <> ''
+        """, (column,))
+
+
+def _prune_lookup_values(cur):
+    """Quita de maximo_lookup los valores que ya no usa ninguna OT (búsqueda por índice)."""
+    for column in LOOKUP_COLUMNS:
+        cur.execute(f"""
+            DELETE FROM maximo_lookup
+            WHERE kind = ?
+              AND NOT EXISTS (SELECT 1 FROM maximo AS m WHERE m.{column} = maximo_lookup.value)
+        """, (column,))
+
+
+def _normalize_stored_ots(cur):
+    """
+    OTs antiguas guardadas con NBSP/espacios: se normalizan una sola vez (queda
+    marcado en PRAGMA user_version) para que el merge pueda buscar por la clave
+    primaria sin REPLACE(). Si la OT limpia ya existe, esa es la que han ido
+    actualizando los merges y la antigua se descarta; entre varias variantes
+    sucias de la misma OT se queda la última insertada.
+    """
+    if cur.execute("PRAGMA user_version").fetchone()[0] >= OTS_NORMALIZED_USER_VERSION:
+        return
+    clean = "TRIM(REPLACE(OT, char(160), ' '))"
+    cur.execute(f"""
+        DELETE FROM maximo
+        WHERE OT <> {clean}
+          AND EXISTS (
+              SELECT 1 FROM maximo AS m
+              WHERE m.OT = TRIM(REPLACE(maximo.OT, char(160), ' '))
+          )
+    """)
+    removed = cur.rowcount
+    cur.execute(f"""
+        DELETE FROM maximo
+        WHERE OT <> {clean}
+          AND rowid NOT IN (SELECT MAX(rowid) FROM maximo WHERE OT <> {clean} GROUP BY {clean})
+    """)
+    removed += cur.rowcount
+    cur.execute(f"UPDATE maximo SET OT = {clean} WHERE OT <> {clean}")
+    if cur.rowcount or removed:
+        logging.info(f"BD: OT normalizadas={cur.rowcount}, duplicadas eliminadas={removed}")
+    cur.execute(f"PRAGMA user_version = {OTS_NORMALIZED_USER_VERSION}")
+
+
+def _create_search_index(cur) -> bool:
+    """
+    Índice FTS5 (tokenizer trigram) sobre las columnas de búsqueda, con
+    contenido externo en maximo y triggers que lo mantienen sincronizado.
+    Devuelve False si este SQLite no tiene FTS5/trigram (se usa LIKE).
+    """
+    exists = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'maximo_fts'"
+    ).fetchone()
+    if exists:
+        return True
+
+    cols = ", ".join(SEARCH_COLUMNS)
+    new_cols = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+    old_cols = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+    try:
+        cur.execute(f"""
+            CREATE VIRTUAL TABLE maximo_fts USING fts5(
+                {cols},
+                content = 'maximo',
+                content_rowid = 'rowid',
+                tokenize = 'trigram'
+            )
+        """)
+    except sqlite3.OperationalError:
+        logging.warning("BD: SQLite sin FTS5/trigram, las búsquedas usarán LIKE", exc_info=True)
+        return False
+
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS maximo_fts_ai AFTER INSERT ON maximo BEGIN
+            INSERT INTO maximo_fts (rowid, {cols}) VALUES (new.rowid, {new_cols});
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS maximo_fts_ad AFTER DELETE ON maximo BEGIN
+            INSERT INTO maximo_fts (maximo_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS maximo_fts_au AFTER UPDATE OF {cols} ON maximo BEGIN
+            INSERT INTO maximo_fts (maximo_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+            INSERT INTO maximo_fts (rowid, {cols}) VALUES (new.rowid, {new_cols});
+        END
+    """)
+    # BD existente: indexamos lo que ya hay
+    cur.execute("INSERT INTO maximo_fts (maximo_fts) VALUES ('rebuild')")
+    logging.info("BD: índice de búsqueda FTS5 creado")
+    return True
+
 
+def _normalize(value) -> str:
+    return "" if value is None else str(value).replace("\u00a0", " ").strip()
 
-def update_database_from_df(df):
-    conn = get_connection()
-    cur = conn.cursor()
 
-    init_db()  # por si acaso
+def _normalize_row(row) -> Tuple:
+    return tuple(_normalize(v) for v in row)
 
-    new_entries = 0
-    updated_entries = 0
 
-    for row in df.itertuples(index=False, name=None):
-        ot = str(row[0]).replace('\u00a0', ' ').strip()
+def row_hash(data: Sequence[str]) -> int:
+    """Hash de 64 bits (entero con signo, como INTEGER de SQLite) de las columnas normalizadas."""
+    digest = hashlib.blake2b("\x1f".join(data).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
 
-        cur.execute("SELECT * FROM maximo WHERE REPLACE(OT, ' ', ' ') = REPLACE(?, ' ', ' ')", (ot,))
-        existing = cur.fetchone()
 
-        new_data = tuple("" if v is None else str(v).replace(' ', ' ').strip() for v in row[1:])
+def _staging_row(row) -> Tuple:
+    values = _normalize_row(row)
+    return values + (row_hash(values[1:]),)
 
-        if existing:
-            existing_data = tuple("" if v is None else str(v).replace(' ', ' ').strip() for v in existing[1:])
-            if existing_data != new_data:
+
+class MergeResult(tuple):
+    """
+    Resultado de merge_rows: la tupla (nuevas, actualizadas) de siempre, así
+    que `new, updated = update_database_from_df(...)` sigue funcionando, más
+    las OT exactas que han cambiado (new_ots, updated_ots, deleted_ots).
+    """
+
+    def __new__(cls, new_entries: int, updated_entries: int, new_ots: Tuple[str, ...] = (),
+                updated_ots: Tuple[str, ...] = (), deleted_ots: Tuple[str, ...] = ()):
+        result = super().__new__(cls, (new_entries, updated_entries))
+        result.new_ots = tuple(new_ots)
+        result.updated_ots = tuple(updated_ots)
+        result.deleted_ots = tuple(deleted_ots)
+        return result
+
+    @property
+    def new_entries(self) -> int:
+        return self[0]
+
+    @property
+    def updated_entries(self) -> int:
+        return self[1]
+
+    def __repr__(self):
+        return (f"MergeResult(new_entries={self[0]}, updated_entries={self[1]}, "
+                f"new_ots={self.new_ots}, updated_ots={self.updated_ots}, "
+                f"deleted_ots={self.deleted_ots})")
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.new_entries or self.updated_entries or self.deleted_ots)
+
+
+def combine_results(results: Iterable[MergeResult]) -> MergeResult:
+    """Suma los MergeResult de varios merges (p.ej. uno por perfil de filtro)."""
+    new_ots: Dict[str, None] = {}
+    updated_ots: Dict[str, None] = {}
+    deleted_ots: Dict[str, None] = {}
+    for result in results:
+        new_ots.update(dict.fromkeys(result.new_ots))
+        updated_ots.update(dict.fromkeys(result.updated_ots))
+        deleted_ots.update(dict.fromkeys(result.deleted_ots))
+    # Una OT nueva en un perfil puede salir como actualizada en otro
+    updated = tuple(ot for ot in updated_ots if ot not in new_ots)
+    return MergeResult(len(new_ots), len(updated), tuple(new_ots), updated, tuple(deleted_ots))
+
+
+def merge_rows(rows: Iterable[Sequence], db_path: Optional[str] = None,
+               delete_missing: bool = False, profile: Optional[str] = None) -> MergeResult:
+    """
+    Fusiona filas (OT, Descripción, Nº de serie, Fecha, Cliente, Tipo de trabajo,
+    Seguimiento, Planta) con la tabla maximo.
+
+    Las filas se procesan por lotes de MERGE_BATCH_SIZE: el row_hash de cada
+    una se compara con el de la BD (consulta por OT sobre el índice
+    (OT, row_hash)) y solo las nuevas o cambiadas se cargan en una tabla
+    temporal. El merge se hace con dos sentencias SQL sobre la clave primaria
+    OT, en una sola transacción; en memoria solo está el lote en curso.
+    Con delete_missing=True (reconciliación completa) se borran además las OT
+    que no vienen en rows. Con profile, rows es el export completo de ese
+    perfil de filtro: sus OT quedan etiquetadas con él en maximo_profile.
+    Devuelve un MergeResult con las OT nuevas, actualizadas y eliminadas
+    (RETURNING, SQLite >= 3.35).
+    """
+    init_db(db_path)  # por si acaso
+
+    cols = ", ".join(MAXIMO_COLUMNS) + ", row_hash"
+    data_cols = MAXIMO_COLUMNS[1:]
+    placeholders = ", ".join("?" for _ in MAXIMO_COLUMNS) + ", ?"
+
+    # OT de rows (todas, no solo las cambiadas): para borrar las que faltan y
+    # para las etiquetas del perfil
+    track_seen = delete_missing or profile is not None
+
+    with get_manager(db_path).writer() as conn:
+        cur = conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS temp.maximo_staging")
+        cur.execute("DROP TABLE IF EXISTS temp.maximo_seen")
+        cur.execute(f"""
+            CREATE TEMP TABLE maximo_staging (
+                OT TEXT PRIMARY KEY,
+                {", ".join(f"{c} TEXT NOT NULL" for c in data_cols)},
+                row_hash INTEGER NOT NULL
+            )
+        """)
+
+        if track_seen:
+            cur.execute("CREATE TEMP TABLE maximo_seen (OT TEXT PRIMARY KEY) WITHOUT ROWID")
+
+        staged = False
+        rows = iter(rows)
+        while True:
+            # Si una OT aparece repetida en el export, gana la última fila
+            batch = {}
+            for row in islice(rows, MERGE_BATCH_SIZE):
+                values = _staging_row(row)
+                batch[values[0]] = values
+            if not batch:
+                break
+            if track_seen:
+                cur.executemany("INSERT OR IGNORE INTO maximo_seen (OT) VALUES (?)", ((ot,) for ot in batch))
+
+            # Hash guardado de las OT del lote (índice (OT, row_hash))
+            ots = list(batch)
+            cur.execute(
+                f"SELECT OT, row_hash FROM maximo WHERE OT IN ({', '.join('?' for _ in ots)})", ots
+            )
+            unchanged = [ot for ot, stored in cur.fetchall() if stored == batch[ot][-1]]
+            if staged and unchanged:
+                # Una fila anterior de la misma OT pudo quedar en staging
                 cur.execute(
-                    """
-                    UPDATE maximo SET
-                        Descripción = ?,
-                        Nº_de_serie = ?,
-                        Fecha = ?,
-                        Cliente = ?,
-                        Tipo_de_trabajo = ?,
-                        Seguimiento = ?,
-                        Planta = ?
-                    WHERE OT = ?
-                    """,
-                    new_data + (ot,)
+                    f"DELETE FROM maximo_staging WHERE OT IN ({', '.join('?' for _ in unchanged)})",
+                    unchanged,
                 )
-                updated_entries += 1
-        else:
+            for ot in unchanged:
+                del batch[ot]
+            if batch:
+                cur.executemany(
+                    f"INSERT OR REPLACE INTO maximo_staging ({cols}) VALUES ({placeholders})",
+                    batch.values(),
+                )
+                staged = True
+
+        cur.execute(f"""
+            UPDATE maximo SET
+                {", ".join(f"{c} = s.{c}" for c in data_cols)},
+                row_hash = s.row_hash
+            FROM maximo_staging AS s
+            WHERE maximo.OT = s.OT
+              AND maximo.row_hash IS NOT s.row_hash
+            RETURNING maximo.OT
+        """)
+        updated_ots = tuple(r[0] for r in cur.fetchall())
+        updated_entries = len(updated_ots)
+
+        cur.execute(f"""
+            INSERT INTO maximo ({cols})
+            SELECT {cols} FROM maximo_staging AS s
+            WHERE NOT EXISTS (SELECT 1 FROM maximo AS m WHERE m.OT = s.OT)
+            RETURNING OT
+        """)
+        new_ots = tuple(r[0] for r in cur.fetchall())
+        new_entries = len(new_ots)
+
+        deleted_ots = ()
+        if delete_missing:
+            cur.execute("""
+                DELETE FROM maximo
+                WHERE NOT EXISTS (SELECT 1 FROM maximo_seen AS s WHERE s.OT = maximo.OT)
+                RETURNING OT
+            """)
+            deleted_ots = tuple(r[0] for r in cur.fetchall())
+        deleted_entries = len(deleted_ots)
+
+        if profile is not None:
             cur.execute(
-                "INSERT INTO maximo VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (ot,) + new_data
+                "INSERT OR IGNORE INTO maximo_profile (profile, OT) "
+                "SELECT ?, OT FROM maximo_seen",
+                (profile,),
             )
-            new_entries += 1
+            cur.execute("""
+                DELETE FROM maximo_profile
+                WHERE profile = ?
+                  AND NOT EXISTS (SELECT 1 FROM maximo_seen AS s WHERE s.OT = maximo_profile.OT)
+            """, (profile,))
+        if deleted_entries:
+            cur.execute("""
+                DELETE FROM maximo_profile
+                WHERE NOT EXISTS (SELECT 1 FROM maximo AS m WHERE m.OT = maximo_profile.OT)
+            """)
+
+        if new_entries or updated_entries:
+            _add_lookup_values(cur, "temp.maximo_staging")
+        if updated_entries or deleted_entries:
+            _prune_lookup_values(cur)
+        if new_entries or updated_entries or deleted_entries:
+            cur.execute(
+                "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (STATE_DATA_VERSION, str(time.time_ns())),
+            )
+
+        cur.execute("DROP TABLE temp.maximo_staging")
+        if track_seen:
+            cur.execute("DROP TABLE temp.maximo_seen")
+
+    logging.info(
+        (f"BD [{profile}]: " if profile is not None else "BD: ")
+        + f"nuevas entradas={new_entries}, actualizadas={updated_entries}"
+        + (f", eliminadas={deleted_entries}" if delete_missing else "")
+    )
+    return MergeResult(new_entries, updated_entries, new_ots, updated_ots, deleted_ots)
+
+
+def get_lookup_values(kind: str, db_path: Optional[str] = None) -> List[str]:
+    """Valores distintos de una columna de LOOKUP_COLUMNS, ordenados (sin recorrer maximo)."""
+    if kind not in LOOKUP_COLUMNS:
+        raise ValueError(f"Columna sin tabla de valores: {kind!r}")
+    conn = _ready_manager(db_path).reader()
+    rows = conn.execute(
+        "SELECT value FROM maximo_lookup WHERE kind = ? ORDER BY value", (kind,)
+    ).fetchall()
+    return [r[0] for r in rows]
+
 
-    conn.commit()
-    conn.close()
-    logging.info(f"BD: nuevas entradas={new_entries}, actualizadas={updated_entries}")
-    return new_entries, updated_entries
+def update_database_from_df(df, db_path: Optional[str] = None) -> MergeResult:
+    return merge_rows(df.itertuples(index=False, name=None), db_path=db_path)
 
 
+def get_sync_state(key: str, default: Optional[str] = None,
+                   db_path: Optional[str] = None) -> Optional[str]:
+    manager = get_manager(db_path)
+    if manager.fts_enabled is None:
+        init_db(db_path)
+    row = manager.reader().execute(
+        "SELECT value FROM sync_state WHERE key = ?", (key,)
+    ).fetchone()
+    return default if row is None else row[0]
 
-def fetch_data(filter_text: str, search_by: str, client_filter: Optional[str]) -> List[Tuple]:
+
+def set_sync_state(values: Dict[str, Optional[str]], db_path: Optional[str] = None):
+    manager = get_manager(db_path)
+    if manager.fts_enabled is None:
+        init_db(db_path)
+    with manager.writer() as conn:
+        conn.executemany(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            list(values.items()),
+        )
+
+
+def get_data_version(db_path: Optional[str] = None) -> str:
+    """Cambia cada vez que un merge modifica maximo (sirve para ETag/cachés)."""
+    return get_sync_state(STATE_DATA_VERSION, "0", db_path=db_path)
+
+
+def _fts_phrase(word: str) -> str:
+    return '"' + word.replace('"', '""') + '"'
+
+
+def _search_clause(manager: ConnectionManager, filter_text: str, search_by: str,
+                   client_filter: Optional[str], date_from=None,
+                   date_to=None) -> Tuple[str, List[str], list, bool]:
+    """
+    Construye FROM + condiciones de una búsqueda. Devuelve
+    (from_sql, condiciones, parámetros, usa_fts).
+
+    Las palabras de 3+ caracteres se resuelven con el índice FTS5 trigram; las
+    más cortas (o si no hay FTS5) con LIKE. date_from/date_to (date o
+    "YYYY-MM-DD", ambos incluidos) son un rango sobre el índice de Fecha_dia.
+    """
+    if search_by not in SEARCH_COLUMNS:
+        raise ValueError(f"Columna de búsqueda no válida: {search_by}")
 
     filter_words = filter_text.strip().split()
-    query = "SELECT * FROM maximo"
-    params = []
+    if manager.fts_enabled:
+        fts_words = [w for w in filter_words if len(w) >= FTS_MIN_TERM_LEN]
+    else:
+        fts_words = []
+    like_words = [w for w in filter_words if w not in fts_words]
 
+    params = []
     conditions = []
-    if filter_words:
-        conditions.append(" AND ".join([f"LOWER({search_by}) LIKE ?" for _ in filter_words]))
-        params.extend(f"%{word.lower()}%" for word in filter_words)
+    if fts_words:
+        from_sql = "maximo_fts AS f JOIN maximo AS m ON m.rowid = f.rowid"
+        conditions.append("maximo_fts MATCH ?")
+        params.append(f"{{{search_by}}} : (" + " AND ".join(_fts_phrase(w) for w in fts_words) + ")")
+    else:
+        from_sql = "maximo AS m"
+
+    if like_words:
+        conditions.append(" AND ".join([f"LOWER(m.{search_by}) LIKE ?" for _ in like_words]))
+        params.extend(f"%{word.lower()}%" for word in like_words)
 
     if client_filter and client_filter != "Todos":
-        conditions.append("Cliente = ?")
+        conditions.append("m.Cliente = ?")
         params.append(client_filter)
 
+    if date_from or date_to:
+        # Las filas sin fecha (Fecha_dia = 0) quedan fuera de cualquier rango
+        conditions.append("m.Fecha_dia >= ?")
+        params.append(julian_day(date_from) if date_from else 1)
+    if date_to:
+        conditions.append("m.Fecha_dia <= ?")
+        params.append(julian_day(date_to))
+
+    return from_sql, conditions, params, bool(fts_words)
+
+
+def _sort_keys(order_by: str) -> Tuple[str, ...]:
+    if order_by not in MAXIMO_COLUMNS:
+        raise ValueError(f"Columna de orden no válida: {order_by}")
+    if order_by == "OT":
+        return OT_SORT_KEYS
+    if order_by == "Fecha":
+        return ("m.Fecha_dia",) + OT_SORT_KEYS
+    return (f"m.{order_by}",) + OT_SORT_KEYS
+
+
+@contextmanager
+def cancel_on(is_cancelled: Callable[[], bool], db_path: Optional[str] = None):
+    """
+    Aborta las consultas de este hilo (fetch_data, count_data...) en cuanto
+    is_cancelled() devuelva True, mediante el progress handler de SQLite.
+    La consulta abortada lanza QueryCancelled.
+    """
+    conn = _ready_manager(db_path).reader()
+    conn.set_progress_handler(lambda: 1 if is_cancelled() else 0, PROGRESS_HANDLER_OPS)
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if "interrupted" in str(e) and is_cancelled():
+            raise QueryCancelled() from None
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+def _ready_manager(db_path: Optional[str] = None) -> ConnectionManager:
+    manager = get_manager(db_path)
+    if manager.fts_enabled is None:
+        init_db(db_path)
+    return manager
+
+
+def fetch_data(filter_text: str, search_by: str, client_filter: Optional[str],
+               rank: bool = False, order_by: Optional[str] = None, descending: bool = False,
+               limit: Optional[int] = None, after: Optional[str] = None,
+               offset: int = 0, date_from=None, date_to=None,
+               db_path: Optional[str] = None) -> List[Tuple]:
+    """
+    Devuelve las filas de maximo que contienen todas las palabras de filter_text
+    en la columna search_by (y del cliente indicado, salvo "Todos").
+
+    - date_from/date_to: rango de Fecha (date o "YYYY-MM-DD", ambos incluidos,
+      None = sin límite). Con cliente es un rango sobre (Cliente, Fecha_dia).
+    - order_by/descending: orden en SQL por una columna (la OT desempata).
+    - limit/after: paginación por keyset; after es la OT de la última fila de la
+      página anterior (mismo filtro y mismo orden). offset solo para saltos.
+    - rank=True (sin order_by): ordena por relevancia de la búsqueda FTS.
+    """
+    manager = _ready_manager(db_path)
+    from_sql, conditions, params, uses_fts = _search_clause(
+        manager, filter_text, search_by, client_filter, date_from, date_to
+    )
+
+    order_sql = ""
+    if order_by is not None:
+        keys = _sort_keys(order_by)
+        direction = "DESC" if descending else "ASC"
+        order_sql = " ORDER BY " + ", ".join(f"{k} {direction}" for k in keys)
+        if after is not None:
+            # (claves de la fila) >/< (claves de la última fila ya mostrada)
+            last_keys = ", ".join(k.replace("m.", "c.") for k in keys)
+            op = "<" if descending else ">"
+            conditions.append(
+                f"({', '.join(keys)}) {op} (SELECT {last_keys} FROM maximo AS c WHERE c.OT = ?)"
+            )
+            params.append(after)
+    elif after is not None:
+        raise ValueError("La paginación por keyset (after) requiere order_by")
+    elif rank and uses_fts:
+        order_sql = " ORDER BY f.rank"
+
+    query = f"SELECT {', '.join(f'm.{c}' for c in MAXIMO_COLUMNS)} FROM {from_sql}"
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
+    query += order_sql
+    if limit is not None or offset:
+        query += " LIMIT ? OFFSET ?"
+        params.extend([-1 if limit is None else int(limit), int(offset)])
+
+    conn = manager.reader()
+    return conn.execute(query, params).fetchall()
 
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(query, params)
-    rows = cur.fetchall()
-    conn.close()
-    return rows
+
+def count_data(filter_text: str, search_by: str, client_filter: Optional[str],
+               date_from=None, date_to=None, db_path: Optional[str] = None) -> int:
+    """Número de filas que devolvería fetch_data con el mismo filtro."""
+    manager = _ready_manager(db_path)
+    from_sql, conditions, params, _ = _search_clause(
+        manager, filter_text, search_by, client_filter, date_from, date_to
+    )
+    query = f"SELECT COUNT(*) FROM {from_sql}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    return manager.reader().execute(query, params).fetchone()[0]
+
+
+class QueryPager:
+    """
+    Adapta fetch_data paginado por keyset a la interfaz fetch_page(inicio, cantidad)
+    del listado virtual. Recuerda la última OT de cada página ya leída: la página
+    siguiente se pide por keyset (O(página)) y solo un salto a una página lejana
+    (arrastrar la scrollbar) usa OFFSET.
+    """
+
+    def __init__(self, page_size: int, **query):
+        if query.get("order_by") is None:
+            raise ValueError("QueryPager requiere order_by")
+        self.page_size = page_size
+        self.query = query
+        self._last_ot: Dict[int, Optional[str]] = {-1: None}
+
+    def __call__(self, start: int, count: int) -> List[Tuple]:
+        page_index = start // self.page_size
+        if page_index - 1 in self._last_ot:
+            rows = fetch_data(limit=self.page_size, after=self._last_ot[page_index - 1], **self.query)
+        else:
+            rows = fetch_data(limit=self.page_size, offset=page_index * self.page_size, **self.query)
+        if rows:
+            self._last_ot[page_index] = rows[-1][0]
+        offset = start - page_index * self.page_size
+        return rows[offset:offset + count]
@@ -0,0 +1,171 @@
+# export_parser.py
+"""
+Parser en streaming del listado de OT que exporta Maximo (HTML con extensión .xls).
+
+Recorre las filas de la primera tabla con lxml.iterparse, liberando cada fila
+tras leerla, así que la memoria no crece con el tamaño del export. Las
+columnas se localizan por el texto de la cabecera.
+"""
+import hashlib
+import logging
+import re
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+# Columna de la BD -> textos de cabecera aceptados en el export
+EXPORT_HEADERS: Dict[str, Tuple[str, ...]] = {
+    "OT": ("OT", "Orden de trabajo", "Orden trabajo"),
+    "Descripción": ("Descripción", "Descripcion"),
+    "Nº_de_serie": ("Nº de serie", "N° de serie", "Número de serie", "Numero de serie"),
+    "Fecha": ("Fecha", "Fecha de notificación", "Fecha notificación"),
+    "Cliente": ("Cliente",),
+    "Tipo_de_trabajo": ("Tipo de trabajo", "Tipo trabajo"),
+    "Seguimiento": ("Seguimiento",),
+    "Planta": ("Planta",),
+}
+
+# Posiciones históricas (las que usaba pd.read_html) si no se reconoce la cabecera
+LEGACY_POSITIONS = (0, 12, 15, 2, 3, 9, 5, 13)
+LEGACY_DATA_START = 2  # fila de título + fila de cabecera
+
+# Filas iniciales en las que se busca la cabecera
+HEADER_SEARCH_ROWS = 5
+
+# Bloques en los que se lee el export para calcular su hash
+DIGEST_CHUNK_BYTES = 1024 * 1024
+
+# Formato de fecha del export: "%d/%m/%y %H:%M:%S"
+_DATE_RE = re.compile(r"(\d{2})/(\d{2})/(\d{2}) \d{2}:\d{2}:\d{2}$")
+
+
+def _clean(text: str) -> str:
+    return " ".join(text.replace("\u00a0", " ").split())
+
+
+def _header_key(text: str) -> str:
+    return _clean(text).lower().replace("°", "º")
+
+
+_HEADER_LOOKUP = {
+    _header_key(name): column
+    for column, names in EXPORT_HEADERS.items()
+    for name in names
+}
+
+
+def _cell_text(cell) -> str:
+    # La mayoría de celdas son texto plano: evitamos itertext() cuando se puede
+    if len(cell) == 0:
+        return _clean(cell.text or "")
+    return _clean("".join(cell.itertext()))
+
+
+def _match_header(cells: List[str]) -> Optional[List[int]]:
+    """Índices (en el orden de EXPORT_HEADERS) si cells es la fila de cabecera."""
+    found: Dict[str, int] = {}
+    for index, text in enumerate(cells):
+        column = _HEADER_LOOKUP.get(_header_key(text))
+        if column is not None and column not in found:
+            found[column] = index
+    if len(found) == len(EXPORT_HEADERS):
+        return [found[c] for c in EXPORT_HEADERS]
+    return None
+
+
+def _format_date(value: str) -> Optional[str]:
+    # Equivale a strptime(EXPORT_DATE_FORMAT) pero mucho más rápido por fila
+    m = _DATE_RE.match(value)
+    if m is None:
+        return None
+    day, month, year = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    year += 2000 if year < 69 else 1900  # mismo pivote que %y
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+def _build_row(cells: list, positions: List[int]) -> Optional[tuple]:
+    values = [_text(cells[p]) if p < len(cells) else "" for p in positions]
+    if not values[0]:
+        return None  # filas vacías / de totales
+    values[3] = _format_date(values[3])
+    return tuple(values)
+
+
+def _text(cell) -> str:
+    return cell if isinstance(cell, str) else _cell_text(cell)
+
+
+def _iter_table_rows(file_path) -> Iterator[list]:
+    """
+    Celdas (elementos td/th) de cada <tr> de la primera tabla del documento.
+    Solo son válidas hasta pedir la fila siguiente: después se liberan.
+    """
+    first_table = None
+    last_parent = last_table = None
+    for _, tr in etree.iterparse(str(file_path), events=("end",), tag="tr", html=True,
+                                 recover=True, huge_tree=True):
+        parent = tr.getparent()
+        if parent is not last_parent:
+            last_parent, last_table = parent, next(tr.iterancestors("table"), None)
+        if first_table is None:
+            first_table = last_table
+        if last_table is first_table:
+            yield [cell for cell in tr if cell.tag in ("td", "th")]
+        # Liberamos la fila y las anteriores ya procesadas
+        tr.clear()
+        if parent is not None:
+            while tr.getprevious() is not None:
+                del parent[0]
+
+
+def iter_export_rows(file_path) -> Iterator[tuple]:
+    """
+    Filas (OT, Descripción, Nº de serie, Fecha, Cliente, Tipo de trabajo,
+    Seguimiento, Planta) del export, ya normalizadas: sin NBSP ni espacios
+    sobrantes y con Fecha como "YYYY-MM-DD" (None si no se puede leer).
+    """
+    positions = None
+    pending = []  # filas leídas antes de encontrar la cabecera
+    for index, cells in enumerate(_iter_table_rows(file_path)):
+        if positions is None:
+            cells = [_cell_text(cell) for cell in cells]
+            positions = _match_header(cells)
+            if positions is not None:
+                pending = []
+                continue
+            pending.append(cells)
+            if index + 1 < HEADER_SEARCH_ROWS:
+                continue
+            logging.warning("Export: cabecera no reconocida, usando posiciones de columna fijas")
+            positions = list(LEGACY_POSITIONS)
+            rows, pending = pending[LEGACY_DATA_START:], []
+            for cells in rows:
+                row = _build_row(cells, positions)
+                if row is not None:
+                    yield row
+            continue
+
+        row = _build_row(cells, positions)
+        if row is not None:
+            yield row
+
+    if positions is None and pending:
+        # Export muy corto y sin cabecera reconocible
+        logging.warning("Export: cabecera no reconocida, usando posiciones de columna fijas")
+        for cells in pending[LEGACY_DATA_START:]:
+            row = _build_row(cells, list(LEGACY_POSITIONS))
+            if row is not None:
+                yield row
+
+
+def export_digest(file_path) -> str:
+    """SHA-256 del fichero exportado (para saltarse un export idéntico al anterior)."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(DIGEST_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
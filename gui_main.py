@@ -1,16 +1,20 @@
 # gui_main.py
 import threading
-import shutil
 import tkinter as tk
 import webbrowser
 from tkinter import ttk, messagebox
 from datetime import datetime, timedelta
 
-from config import load_config, save_config, set_credentials, AppConfig, credentials_configured, BASE_DIR, DATA_DIR
-from db import fetch_data, init_db
-from maximo_client import open_ot
-from updater import run_update
+from config import load_config, save_config, flush_config, set_credentials, AppConfig, credentials_configured, BASE_DIR, DATA_DIR
+from virtual_table import VirtualTreeview
+from tooltip import Tooltip
+from date_picker import DateEntry
+from live_search import SearchRunner
+from sync_scheduler import SyncScheduler
+from sync_metrics import format_breakdown, last_trace
+from db import MAXIMO_COLUMNS, QueryPager, count_data, get_lookup_values, init_db, close_all as close_db
 import logging
+import sys
 import version
 from update_checker import fetch_latest_release, is_newer, format_version_tag
 from pathlib import Path
@@ -28,6 +32,9 @@ logging.basicConfig(
 
 logging.info(f"App Version: {version.APP_VERSION} - Iniciando la aplicación")
 
+# Espera tras la última tecla antes de lanzar la búsqueda
+SEARCH_DEBOUNCE_MS = 250
+
 
 
 
@@ -46,8 +53,23 @@ class MaximoApp(tk.Tk):
             logging.debug("icon.ico no encontrado; se omite iconbitmap.")
 
         self.cfg: AppConfig = load_config()
-        self.auto_update_job = None  # ID del after() del auto-update
-        self.ot_sessions = []  # sesiones Edge visibles (OT)
+        # Sincronizaciones (manual y auto-update): una sola a la vez
+        self.sync_scheduler = SyncScheduler(
+            self._run_sync,
+            on_start=self._on_sync_start,
+            on_done=self._on_sync_done,
+            on_error=self._on_sync_error,
+        )
+        # Navegadores Edge visibles (OT): se crean al primer uso para no cargar
+        # selenium al arrancar
+        self._ot_pool = None
+        self._ot_pool_lock = threading.Lock()
+        self._closing = False
+        # Búsquedas del listado en segundo plano (cancelables), y las páginas
+        # que se leen al hacer scroll, en otro hilo para no cancelarse entre sí
+        self.search_runner = SearchRunner(self)
+        self.page_runner = SearchRunner(self)
+        self._search_job = None
         self.protocol("WM_DELETE_WINDOW", self.on_close)
         self.after(500, lambda: self.check_updates(notify_popup=True))
         init_db()
@@ -64,6 +86,26 @@ class MaximoApp(tk.Tk):
         if self.cfg.auto_update_enabled:
             self.schedule_auto_update()
 
+        # Precalentamos en segundo plano el navegador para abrir OTs
+        if credentials_configured():
+            self.after(3000, lambda: threading.Thread(target=self._warm_up_ot_pool, daemon=True).start())
+
+    def _get_ot_pool(self):
+        # Import diferido: selenium solo se carga cuando hace falta un navegador
+        with self._ot_pool_lock:
+            if self._closing:
+                raise RuntimeError("La aplicación se está cerrando.")
+            if self._ot_pool is None:
+                from ot_pool import OtBrowserPool
+                self._ot_pool = OtBrowserPool()
+            return self._ot_pool
+
+    def _warm_up_ot_pool(self):
+        try:
+            self._get_ot_pool().warm_up()
+        except Exception:
+            logging.warning("No se pudo precalentar el navegador de OT", exc_info=True)
+
     def _ensure_credentials(self) -> bool:
         """
         Devuelve True si hay credenciales configuradas.
@@ -117,10 +159,17 @@ class MaximoApp(tk.Tk):
         status_bar = ttk.Label(self, textvariable=self.status_var,
                                anchor="w", relief="sunken")
         status_bar.pack(fill="x", side="bottom")
+        # Desglose por fases de la última sincronización
+        Tooltip(status_bar, self._last_sync_breakdown)
 
         # Mostrar, si existe, el último estado correcto guardado
         self._load_last_status_into_statusbar()
 
+    @staticmethod
+    def _last_sync_breakdown():
+        trace = last_trace()
+        return format_breakdown(trace) if trace else None
+
     def _load_last_status_into_statusbar(self):
         """
         Si hay un último estado correcto guardado en la configuración,
@@ -153,13 +202,25 @@ class MaximoApp(tk.Tk):
         self.client_combo.pack(side="left", padx=5)
         self.client_combo.bind("<<ComboboxSelected>>", lambda e: self.update_table())
 
+        # Rango de fechas (vacío = sin límite)
+        ttk.Label(top_frame, text="Desde:").pack(side="left", padx=(10, 2))
+        self.date_from = DateEntry(top_frame, on_change=self.update_table)
+        self.date_from.pack(side="left")
+        ttk.Label(top_frame, text="Hasta:").pack(side="left", padx=(10, 2))
+        self.date_to = DateEntry(top_frame, on_change=self.update_table)
+        self.date_to.pack(side="left")
+        ttk.Button(top_frame, text="30 días", command=self._last_30_days).pack(side="left", padx=5)
+
         # Búsqueda
         self.search_var = tk.StringVar()
         self.search_entry = ttk.Entry(top_frame, textvariable=self.search_var, width=40)
         self.search_entry.pack(side="left", padx=5)
         self.search_entry.bind("<Return>", lambda e: self.update_table())
+        # Búsqueda mientras se escribe
+        self.search_var.trace_add("write", lambda *_: self._schedule_search())
 
         self.search_by = tk.StringVar(value="OT")
+        self.search_by.trace_add("write", lambda *_: self._schedule_search())
         rb_frame = ttk.Frame(top_frame)
         rb_frame.pack(side="left", padx=10)
         ttk.Radiobutton(rb_frame, text="OT", variable=self.search_by, value="OT").pack(anchor="w")
@@ -178,21 +239,21 @@ class MaximoApp(tk.Tk):
                    "Cliente", "Tipo de trabajo", "Seguimiento", "Planta")
         self.columns = columns
         self.sort_order = {c: False for c in columns}
+        # por defecto, ordenar por OT desc
+        self.sort_column = "OT"
+        self.sort_desc = True
 
-        self.tree = ttk.Treeview(self.list_frame, columns=columns, show="headings")
+        # Tabla virtual: solo se pintan las filas visibles (con su scrollbar)
+        self.table = VirtualTreeview(self.list_frame, columns, page_runner=self.page_runner)
+        self.table.pack(fill="both", expand=True)
+        self.tree = self.table.tree
         for col in columns:
             self.tree.heading(col, text=col,
                               command=lambda c=col: self.sort_by_column(c))
             self.tree.column(col, width=100)
-        self.tree.pack(fill="both", expand=True)
 
         self.tree.bind("<Double-1>", self.on_double_click)
 
-        # Scrollbar vertical
-        scrollbar = ttk.Scrollbar(self.tree, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side="right", fill="y")
-
         # Menú contextual copiar
         self._build_context_menu()
 
@@ -271,14 +332,20 @@ class MaximoApp(tk.Tk):
         self.auto_update_var.set(self.cfg.auto_update_enabled)
         self.interval_var.set(self.cfg.auto_update_interval_min)
 
-        # Cargar lista de clientes para el combo
+        self.client_combo.set("Todos")
+        self.refresh_client_combo()
+
+    def refresh_client_combo(self):
+        """Recarga la lista de clientes del combo desde la tabla de valores de la BD."""
         try:
-            with open("clientes_unicos.txt", "r", encoding="utf-8") as f:
-                clients = [line.strip() for line in f.readlines() if line.strip()]
-        except FileNotFoundError:
-            clients = []
+            clients = get_lookup_values("Cliente")
+        except Exception:
+            logging.exception("No se pudo leer la lista de clientes")
+            return
         self.client_combo["values"] = ["Todos"] + clients
-        self.client_combo.set("Todos")
+        # Si el cliente seleccionado ya no existe, volvemos a "Todos"
+        if self.client_var.get() not in clients:
+            self.client_combo.set("Todos")
 
     def save_config_from_ui(self):
         self.cfg.username = self.user_var.get().strip()
@@ -297,46 +364,79 @@ class MaximoApp(tk.Tk):
 
 
     # ---------- Listado ----------
-    def update_table(self):
+    def _schedule_search(self):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(SEARCH_DEBOUNCE_MS, self.update_table)
+
+    def _last_30_days(self):
+        today = datetime.now().date()
+        self.date_to.set_date(None, notify=False)
+        self.date_from.set_date(today - timedelta(days=30), notify=False)
+        self.update_table()
+
+    def update_table(self, keep_position: bool = False):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+
         filter_text = self.search_var.get()
         search_by = self.search_by.get()
         client_filter = self.client_var.get()
+        date_from = self.date_from.get_date()
+        date_to = self.date_to.get_date()
+        order_by = MAXIMO_COLUMNS[self.columns.index(self.sort_column)]
+        descending = self.sort_desc
+        page_size = self.table.page_size
+        first_page = self.table.offset // page_size if keep_position else 0
+
+        def search():
+            # Hilo de búsqueda: total y páginas visibles, orden y paginación en SQL
+            total = count_data(filter_text, search_by, client_filter,
+                               date_from=date_from, date_to=date_to)
+            pager = QueryPager(
+                page_size,
+                filter_text=filter_text,
+                search_by=search_by,
+                client_filter=client_filter,
+                date_from=date_from,
+                date_to=date_to,
+                order_by=order_by,
+                descending=descending,
+            )
+            preload = {
+                page: pager(page * page_size, page_size)
+                for page in (first_page, first_page + 1)
+                if page * page_size < total
+            }
+            return total, pager, preload
 
-        data = fetch_data(filter_text, search_by, client_filter)
-        # por defecto, ordenar por OT desc
-        data.sort(key=lambda x: x[0], reverse=True)
-
-        for row in self.tree.get_children():
-            self.tree.delete(row)
+        def show(result):
+            total, pager, preload = result
+            self.table.set_source(total, pager, keep_position=keep_position, preload=preload)
 
-        for row in data:
-            self.tree.insert("", "end", values=row)
+        self.search_runner.submit(search, show)
 
     def sort_by_column(self, column):
-        data = [self.tree.item(i, "values") for i in self.tree.get_children()]
-        idx = self.columns.index(column)
         reverse = not self.sort_order[column]
         self.sort_order[column] = reverse
-        sorted_data = sorted(data, key=lambda x: x[idx], reverse=reverse)
-
-        for row_id in self.tree.get_children():
-            self.tree.delete(row_id)
-        for row in sorted_data:
-            self.tree.insert("", "end", values=row)
+        self.sort_column = column
+        self.sort_desc = reverse
+        self.update_table()
 
         self.tree.heading(column, text=f"{column} {'↓' if reverse else '↑'}",
                           command=lambda c=column: self.sort_by_column(c))
 
     def on_double_click(self, event):
         selected = self.tree.selection()
-        if not selected:
+        if not selected or self.table.is_placeholder(selected[0]):
             return
         ot = self.tree.item(selected[0], "values")[0]
         self.open_ot_threaded(ot)
 
     def copy_cell_to_clipboard(self):
         selected = self.tree.selection()
-        if not selected:
+        if not selected or self.table.is_placeholder(selected[0]):
             return
         values = self.tree.item(selected[0], "values")
         if not values:
@@ -351,114 +451,126 @@ class MaximoApp(tk.Tk):
 
     # ---------- Actualización (manual / auto) ----------
     def update_now_threaded(self, show_popup: bool = True):
-        # Comprobar credenciales antes de lanzar el hilo
+        # Comprobar credenciales antes de pedir la sincronización
         if not self._ensure_credentials():
             return
+        # Una sola sincronización a la vez: si ya hay una en curso, nos unimos a ella
+        if not self.sync_scheduler.request():
+            logging.info("Actualización ya en curso: se espera a su resultado")
 
-        t = threading.Thread(target=self._update_now_worker,
-                             args=(show_popup,), daemon=True)
-        t.start()
-
-
+    @staticmethod
+    def _run_sync():
+        """Corre en el hilo del planificador."""
+        if not credentials_configured():
+            raise RuntimeError("No hay usuario y/o contraseña configurados.")
+        from updater import run_update  # import diferido (selenium, lxml)
+        return run_update(headless=True)
 
-    def _update_now_worker(self, show_popup: bool):
+    def _in_ui(self, callback):
+        """Pasa un aviso del hilo del planificador al hilo de Tk."""
         try:
-            # Mensaje mientras se actualiza
-            self.after(0, lambda: self.status_var.set("⏳ Actualizando base de datos..."))
-
-            new_entries, updated_entries = run_update(headless=True)
-
-            def on_done():
-                # Momento en que terminamos correctamente
-                dt = datetime.now()
-
-                # Texto bonito para la barra
-                msg = self._format_ok_status(dt, new_entries, updated_entries)
-                self.status_var.set(msg)
-                self.update_table()
-
-                # Guardar como último estado correcto (persistente)
-                self.cfg.last_status = {
-                    "ts": dt.isoformat(timespec="minutes"),
-                    "new_entries": int(new_entries),
-                    "updated_entries": int(updated_entries),
-                }
-                save_config(self.cfg)
-
-                if show_popup:
-                    # Si algún día quieres popup en actualización manual, lo pones aquí
-                    # messagebox.showinfo("Actualización completada", msg)
-                    pass
-
-            self.after(0, on_done)
+            self.after(0, callback)
+        except RuntimeError:
+            pass  # la ventana ya no existe
+
+    def _on_sync_start(self, manual: bool):
+        # Mensaje mientras se actualiza
+        self._in_ui(lambda: self.status_var.set("⏳ Actualizando base de datos..."))
+
+    def _on_sync_done(self, result, manual: bool):
+        new_entries, updated_entries = result.new_entries, result.updated_entries
+
+        def on_done():
+            # Momento en que terminamos correctamente
+            dt = datetime.now()
+
+            # Texto bonito para la barra
+            msg = self._format_ok_status(dt, new_entries, updated_entries)
+            self.status_var.set(msg)
+            if result.changed:
+                self.refresh_client_combo()
+                if self._sync_touches_listing(result):
+                    # Mismo filtro, orden, scroll y selección: el listado solo
+                    # toca los items de las OT que han cambiado
+                    self.update_table(keep_position=True)
+
+            # Guardar como último estado correcto (persistente)
+            self.cfg.last_status = {
+                "ts": dt.isoformat(timespec="minutes"),
+                "new_entries": int(new_entries),
+                "updated_entries": int(updated_entries),
+            }
+            save_config(self.cfg)
 
+        self._in_ui(on_done)
 
-        except Exception as e:
-            err_msg = str(e)
-            def on_error():
+    def _sync_touches_listing(self, result) -> bool:
+        """
+        False si el listado cargado no cambia con el merge (y no hace falta
+        repetir count_data ni la consulta de la ventana): ninguna OT nueva ni
+        eliminada, ninguna actualizada en las páginas leídas, y el listado sin
+        filtros y ordenado por OT, así que una OT actualizada de fuera de esas
+        páginas tampoco puede entrar en ellas.
+        """
+        if result.new_ots or result.deleted_ots:
+            return True
+        loaded = self.table.loaded_keys()
+        if any(ot in loaded for ot in result.updated_ots):
+            return True
+        filtered = (
+            self.search_var.get().strip()
+            or self.client_var.get() != "Todos"
+            or self.date_from.get_date() is not None
+            or self.date_to.get_date() is not None
+        )
+        return bool(filtered) or self.sort_column != "OT"
+
+    def _on_sync_error(self, error: Exception, manual: bool):
+        err_msg = str(error)
+
+        def on_error():
+            # Los fallos del auto-update se reintentan solos: popup solo si
+            # la actualización la ha pedido el usuario
+            if manual:
                 messagebox.showerror("Error", f"Error en actualización:\n{err_msg}")
-                last = getattr(self.cfg, "last_status", None)
-                if last:
-                    # Construimos mensaje con la última correcta
-                    try:
-                        ts = last.get("ts")
-                        new_entries = int(last.get("new_entries", 0))
-                        updated_entries = int(last.get("updated_entries", 0))
-                        dt = datetime.fromisoformat(ts)
-                        ok_part = self._format_ok_status(dt, new_entries, updated_entries)
-                        # ok_part ya empieza con ✅/🟢, lo adaptamos un poco:
-                        # quitamos el emoji inicial para reutilizar el texto
-                        if ok_part[0] in ("✅", "🟢"):
-                            ok_part = ok_part[2:]  # quita "✅ " / "🟢 "
-                        self.status_var.set(
-                            f"❌ Error en la última actualización. Última correcta: {ok_part}"
-                        )
-                    except Exception:
-                        self.status_var.set("❌ Error en la última actualización.")
-                else:
+            last = getattr(self.cfg, "last_status", None)
+            if last:
+                # Construimos mensaje con la última correcta
+                try:
+                    ts = last.get("ts")
+                    new_entries = int(last.get("new_entries", 0))
+                    updated_entries = int(last.get("updated_entries", 0))
+                    dt = datetime.fromisoformat(ts)
+                    ok_part = self._format_ok_status(dt, new_entries, updated_entries)
+                    # ok_part ya empieza con ✅/🟢, lo adaptamos un poco:
+                    # quitamos el emoji inicial para reutilizar el texto
+                    if ok_part[0] in ("✅", "🟢"):
+                        ok_part = ok_part[2:]  # quita "✅ " / "🟢 "
+                    self.status_var.set(
+                        f"❌ Error en la última actualización. Última correcta: {ok_part}"
+                    )
+                except Exception:
                     self.status_var.set("❌ Error en la última actualización.")
+            else:
+                self.status_var.set("❌ Error en la última actualización.")
 
-            self.after(0, on_error)
-
-
+        self._in_ui(on_error)
 
     def schedule_auto_update(self):
         """
         Configura (o detiene) el auto-update según self.cfg.auto_update_enabled
-        y self.cfg.auto_update_interval_min. Garantiza que solo haya un timer activo.
+        y los intervalos de la configuración. El planificador garantiza una
+        sola sincronización a la vez, reintenta con espera exponencial y
+        adapta el intervalo a los cambios encontrados.
         """
-        # Si ya había un auto-update programado, lo cancelamos
-        if self.auto_update_job is not None:
-            try:
-                self.after_cancel(self.auto_update_job)
-            except Exception:
-                pass
-            self.auto_update_job = None
-
-        # Si está desactivado en la configuración, no programamos nada
-        if not self.cfg.auto_update_enabled:
-            # Si quieres, puedes actualizar la barra de estado aquí:
-            # self.status_var.set("Auto-actualización desactivada.")
-            return
-
-        interval_ms = self.cfg.auto_update_interval_min * 60 * 1000
-
-        def tick():
-            # Si mientras tanto se ha desactivado, paramos el bucle
-            if not self.cfg.auto_update_enabled:
-                self.auto_update_job = None
-                return
-
-            # Ejecutamos la actualización silenciosa (sin popups)
-            self.update_now_threaded(show_popup=False)
-
-            # Programamos la siguiente ejecución
-            self.auto_update_job = self.after(interval_ms, tick)
-
-        # Programamos la primera ejecución
-        self.auto_update_job = self.after(interval_ms, tick)
-        # Si tienes barra de estado, aquí podrías poner algo tipo:
-        # self.status_var.set(f"Auto-actualización cada {self.cfg.auto_update_interval_min} min.")
+        self.sync_scheduler.configure(
+            enabled=self.cfg.auto_update_enabled,
+            interval_min=self.cfg.auto_update_interval_min,
+            min_interval_min=min(self.cfg.auto_update_min_interval_min, self.cfg.auto_update_interval_min),
+            max_interval_min=max(self.cfg.auto_update_max_interval_min, self.cfg.auto_update_interval_min),
+            adaptive=self.cfg.auto_update_adaptive,
+            retry_sec=self.cfg.auto_update_retry_sec,
+        )
 
 
     # ---------- Abrir OT ----------
@@ -469,10 +581,9 @@ class MaximoApp(tk.Tk):
 
         def worker():
             try:
-                session = open_ot(ot, headless=False)  # devuelve (driver, profile_dir)
-                if session:
-                    self.after(0, lambda s=session: self._register_ot_session(s))
+                self._get_ot_pool().open_ot(ot)
             except Exception as e:
+                logging.exception(f"Error al abrir OT en Maximo (OT={ot})")
                 err_msg = str(e)
                 # Y usamos esa variable dentro del callback de Tkinter
                 self.after(
@@ -594,26 +705,33 @@ class MaximoApp(tk.Tk):
 
 
 
-    def _register_ot_session(self, session):
-        """Guarda (driver, profile_dir) para mantener viva la ventana y poder limpiarla al cerrar la app."""
-        try:
-            self.ot_sessions.append(session)
-            logging.info(f"OT session registrada. Total sesiones OT: {len(self.ot_sessions)}")
-        except Exception:
-            logging.exception("No se pudo registrar la sesión OT")
-
     def on_close(self):
         """Cierre ordenado: cierra navegadores visibles y elimina sus perfiles temporales."""
-        sessions = list(getattr(self, "ot_sessions", []) or [])
-        for driver, profile_dir in sessions:
-            try:
-                driver.quit()
-            except Exception:
-                pass
-            try:
-                shutil.rmtree(profile_dir, ignore_errors=True)
-            except Exception:
-                pass
+        self.search_runner.close()
+        self.page_runner.close()
+        self.sync_scheduler.close()
+        with self._ot_pool_lock:
+            self._closing = True
+        try:
+            if self._ot_pool is not None:
+                self._ot_pool.close()
+        except Exception:
+            logging.exception("No se pudieron cerrar los navegadores de OT")
+        try:
+            # Si nunca se ha sincronizado, updater no está cargado y no hay nada que cerrar
+            updater = sys.modules.get("updater")
+            if updater is not None:
+                updater.close_sync_session()
+        except Exception:
+            logging.exception("No se pudo cerrar el navegador de sincronización")
+        try:
+            close_db()
+        except Exception:
+            logging.exception("No se pudieron cerrar las conexiones a la BD")
+        try:
+            flush_config()
+        except Exception:
+            logging.exception("No se pudo guardar la configuración al cerrar")
         self.destroy()
 
 if __name__ == "__main__":
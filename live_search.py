@@ -0,0 +1,81 @@
+# live_search.py
+import logging
+import threading
+from typing import Callable, Optional
+
+from db import QueryCancelled, cancel_on
+
+
+class SearchRunner:
+    """
+    Ejecuta las búsquedas del listado en un hilo lector propio, fuera del hilo de Tk.
+
+    Solo importa la última búsqueda: submit() de una nueva aborta la que esté
+    en curso (progress handler de SQLite) y descarta las que esperan. El
+    resultado se entrega en el hilo de Tk con widget.after, y solo si sigue
+    siendo el de la búsqueda más reciente.
+    """
+
+    def __init__(self, widget):
+        self._widget = widget
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._generation = 0
+        self._pending: Optional[tuple] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="busqueda", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[], object], on_result: Callable[[object], None]):
+        """job() corre en el hilo de búsqueda; on_result(resultado) en el de Tk."""
+        with self._lock:
+            self._generation += 1
+            self._pending = (self._generation, job, on_result)
+        self._wakeup.set()
+
+    def cancel(self):
+        """Descarta la búsqueda pendiente y aborta la que esté en curso."""
+        with self._lock:
+            self._generation += 1
+            self._pending = None
+
+    def _is_stale(self, generation: int) -> bool:
+        return self._closed or generation != self._generation
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                self._wakeup.clear()
+                if self._closed:
+                    return
+                pending, self._pending = self._pending, None
+            if pending is None:
+                continue
+
+            generation, job, on_result = pending
+            try:
+                with cancel_on(lambda: self._is_stale(generation)):
+                    result = job()
+            except QueryCancelled:
+                logging.debug("Búsqueda cancelada por otra más reciente")
+                continue
+            except Exception:
+                logging.exception("Error en la búsqueda")
+                continue
+
+            if self._is_stale(generation):
+                continue
+            try:
+                self._widget.after(0, lambda: self._deliver(generation, on_result, result))
+            except RuntimeError:
+                return  # la ventana ya no existe
+
+    def _deliver(self, generation: int, on_result, result):
+        if not self._is_stale(generation):
+            on_result(result)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()
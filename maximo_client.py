@@ -2,10 +2,12 @@
 import os
 import time
 import shutil
-import pandas as pd
 import logging
 import tempfile
+import urllib.parse
 from config import load_config, get_credentials, DATA_DIR
+from db import MAXIMO_COLUMNS
+from export_parser import iter_export_rows
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -14,10 +16,13 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import WebDriverException
 
 
-def setup_driver(headless=True, profile_dir=None):
+def setup_driver(headless=True, profile_dir=None, download_dir=None):
     cfg = load_config()
+    if download_dir is None:
+        download_dir = cfg.download_dir
     logging.info("Inicializando Edge...")
 
     options = EdgeOptions()
@@ -35,14 +40,97 @@ def setup_driver(headless=True, profile_dir=None):
         )
     options.add_argument(f"--user-data-dir={profile_dir}")
 
-    # Descarga por defecto
-    options.add_argument(f"--download-default-directory={cfg.download_dir}")
+    # Carpeta de descarga (sin preguntar al usuario)
+    options.add_argument(f"--download-default-directory={download_dir}")
+    options.add_experimental_option("prefs", {
+        "download.default_directory": str(download_dir),
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+    })
 
     driver = webdriver.Edge(options=options)
+    # En headless las prefs no siempre se respetan: lo forzamos por CDP. Si
+    # falla, el export acabaría en otra carpeta y se esperaría hasta el timeout.
+    if headless and not set_download_dir(driver, download_dir):
+        driver.quit()
+        raise RuntimeError(f"No se pudo fijar la carpeta de descarga {download_dir} en Edge headless.")
     logging.info("Navegador inicializado.")
     return driver
 
 
+def set_download_dir(driver, download_dir) -> bool:
+    """Cambia la carpeta de descarga de un navegador ya abierto (CDP)."""
+    try:
+        driver.execute_cdp_cmd(
+            "Page.setDownloadBehavior",
+            {"behavior": "allow", "downloadPath": str(download_dir)},
+        )
+        return True
+    except Exception:
+        logging.warning("No se pudo fijar la carpeta de descarga por CDP", exc_info=True)
+        return False
+
+
+def driver_alive(driver) -> bool:
+    """False si el navegador se ha cerrado o colgado."""
+    try:
+        driver.current_window_handle
+        driver.execute_script("return 1;")
+        return True
+    except WebDriverException:
+        return False
+
+
+def on_login_page(driver) -> bool:
+    """True si Maximo muestra el formulario de login (p. ej. sesión caducada)."""
+    return bool(driver.find_elements(By.ID, "username") and driver.find_elements(By.ID, "password"))
+
+
+# Maximo muestra un indicador "wait" mientras procesa una petición
+MAXIMO_IDLE_JS = """
+    if (document.readyState !== "complete") { return false; }
+    var w = document.getElementById("wait");
+    return !w || w.offsetParent === null || getComputedStyle(w).visibility === "hidden";
+"""
+
+# Si tras una acción el indicador no aparece en este tiempo, asumimos que ya terminó
+BUSY_APPEAR_TIMEOUT_SEC = 3
+
+
+def wait_for(driver, condition, description, timeout=None):
+    """
+    Espera a que condition(driver) devuelva algo "truthy" y lo devuelve.
+    Si vence el timeout (por defecto cfg.wait_timeout_sec) lanza RuntimeError
+    indicando qué se estaba esperando.
+    """
+    if timeout is None:
+        timeout = load_config().wait_timeout_sec
+    try:
+        return WebDriverWait(driver, timeout, poll_frequency=0.25).until(condition)
+    except TimeoutException:
+        logging.warning(f"Timeout ({timeout}s) esperando {description}")
+        raise RuntimeError(
+            f"Maximo no respondió a tiempo ({timeout}s) esperando {description}."
+        ) from None
+
+
+def wait_for_maximo_idle(driver, timeout=None, after_element=None):
+    """
+    Espera a que Maximo termine de procesar la última acción: primero, brevemente,
+    a que la página reaccione (after_element obsoleto o indicador visible) y
+    después a que el documento esté cargado y el indicador "wait" oculto.
+    """
+    reacted = EC.any_of(
+        EC.staleness_of(after_element) if after_element is not None else (lambda d: False),
+        lambda d: not d.execute_script(MAXIMO_IDLE_JS),
+    )
+    try:
+        WebDriverWait(driver, BUSY_APPEAR_TIMEOUT_SEC, poll_frequency=0.1).until(reacted)
+    except TimeoutException:
+        pass
+    wait_for(driver, lambda d: d.execute_script(MAXIMO_IDLE_JS), "a que Maximo termine de cargar", timeout)
+
+
 def login(driver):
     cfg = load_config()
     username, password = get_credentials()
@@ -56,23 +144,35 @@ def login(driver):
     for attempt in range(max_attempts):
         logging.info(f"Cargando página de login (intento {attempt+1}/{max_attempts})...")
         driver.get(url)
-        time.sleep(6)
-        body_text = driver.find_element(By.TAG_NAME, "body").text
-        if "Maximo" in driver.title and len(body_text) > 50:
+        try:
+            wait_for(
+                driver,
+                lambda d: "Maximo" in d.title and d.find_elements(By.ID, "username"),
+                "la página de login",
+            )
             break
-        if attempt == max_attempts - 1:
-            logging.warning("No se pudo cargar la página de login")
-            raise RuntimeError("No se pudo cargar la página de login.")
+        except RuntimeError:
+            if attempt == max_attempts - 1:
+                logging.warning("No se pudo cargar la página de login")
+                raise RuntimeError("No se pudo cargar la página de login.")
 
 
     logging.info("Ingresando credenciales...")
     driver.find_element(By.ID, "username").clear()
     driver.find_element(By.ID, "username").send_keys(username)
-    driver.find_element(By.ID, "password").clear()
-    driver.find_element(By.ID, "password").send_keys(password + Keys.RETURN)
-
-    # Damos unos segundos para que Maximo muestre el posible mensaje de error
-    time.sleep(5)
+    password_field = driver.find_element(By.ID, "password")
+    password_field.clear()
+    password_field.send_keys(password + Keys.RETURN)
+
+    # Esperamos a que Maximo muestre el posible mensaje de error o cambie de página
+    wait_for(
+        driver,
+        EC.any_of(
+            EC.visibility_of_element_located((By.CLASS_NAME, "errorText")),
+            EC.staleness_of(password_field),
+        ),
+        "la respuesta al login",
+    )
 
     # Comprobar el mensaje de error BMXAA7901E en <div class="errorText">
     try:
@@ -91,130 +191,200 @@ def login(driver):
 
 def open_workorders_app(driver):
     logging.info("Accediendo a la sección de filtros...")
-    time.sleep(10)
-    driver.find_element(By.ID, "FavoriteApp_WO_TR").click()
-    time.sleep(10)
+    favorite = wait_for(
+        driver,
+        EC.element_to_be_clickable((By.ID, "FavoriteApp_WO_TR")),
+        "el acceso a la aplicación de OT (FavoriteApp_WO_TR)",
+    )
+    favorite.click()
+    wait_for(
+        driver,
+        EC.presence_of_element_located((By.ID, "quicksearch")),
+        "la aplicación de órdenes de trabajo",
+    )
+    wait_for_maximo_idle(driver)
     logging.info("Sección de filtros abierta.")
 
 
-def apply_filter(driver):
-    cfg = load_config()
-    filters = cfg.filters
+def apply_filter(driver, filters=None, clear_fields=()):
+    """
+    Rellena los campos de filtro (por defecto cfg.filters) y lanza la búsqueda.
+    clear_fields: otros campos que hay que vaciar (los de otros perfiles que
+    pueden seguir rellenos en un navegador reutilizado).
+    """
+    if filters is None:
+        filters = load_config().filters
     logging.info("Aplicando filtros...")
+    for field_id in clear_fields:
+        if field_id in filters:
+            continue
+        for field in driver.find_elements(By.ID, field_id):
+            if field.get_attribute("value"):
+                field.clear()
     for field_id, value in filters.items():
         logging.info(f"Llenando campo {field_id} con {value}")
-        field = driver.find_element(By.ID, field_id)
+        field = wait_for(
+            driver,
+            EC.element_to_be_clickable((By.ID, field_id)),
+            f"el campo de filtro {field_id}",
+        )
         field.clear()
         field.send_keys(value)
-        time.sleep(1)
     field.send_keys(Keys.RETURN)
-    time.sleep(10)
+    wait_for_maximo_idle(driver, after_element=field)
     logging.info("Filtros aplicados.")
 
 
-def download_file(driver):
-    logging.info("Descargando archivo...")
-    time.sleep(10)
-    download_button = driver.find_element(By.ID, "mx38-lb4")
-    driver.execute_script("arguments[0].click();", download_button)
-    time.sleep(45)
-    logging.info("Archivo descargado.")
+PARTIAL_DOWNLOAD_SUFFIXES = (".crdownload", ".partial", ".tmp")
+DOWNLOAD_POLL_SEC = 0.5
 
 
-def move_latest_file():
-    cfg = load_config()
-    download_dir = cfg.download_dir
-    dest_folder = cfg.dest_folder
-    os.makedirs(dest_folder, exist_ok=True)
+def wait_for_download(download_dir, timeout, suffix=".xls"):
+    """
+    Espera a que en download_dir (carpeta exclusiva de esta sesión) haya un
+    fichero *suffix terminado: sin descargas parciales y con el tamaño estable
+    entre dos comprobaciones. Devuelve su ruta o lanza RuntimeError al vencer timeout.
+    """
+    deadline = time.monotonic() + timeout
+    last_sizes = None
+    while time.monotonic() < deadline:
+        names = os.listdir(download_dir)
+        partial = any(n.endswith(PARTIAL_DOWNLOAD_SUFFIXES) for n in names)
+        done = [n for n in names if n.endswith(suffix)]
+        if done and not partial:
+            sizes = {n: os.path.getsize(os.path.join(download_dir, n)) for n in done}
+            if sizes == last_sizes and all(sizes.values()):
+                return os.path.join(download_dir, max(done, key=sizes.get))
+            last_sizes = sizes
+        else:
+            last_sizes = None
+        time.sleep(DOWNLOAD_POLL_SEC)
+
+    logging.warning(f"Timeout ({timeout}s) esperando la descarga en {download_dir}")
+    raise RuntimeError(
+        f"La descarga del listado no terminó en {timeout}s "
+        f"(carpeta {download_dir})."
+    )
 
-    logging.info("Moviendo archivo descargado...")
-    files = sorted(
-        [f for f in os.listdir(download_dir) if f.endswith(".xls")],
-        key=lambda x: os.path.getctime(os.path.join(download_dir, x)),
-        reverse=True
+
+def download_file(driver, download_dir):
+    """Pulsa el botón de descarga y devuelve la ruta del fichero descargado."""
+    cfg = load_config()
+    logging.info("Descargando archivo...")
+    download_button = wait_for(
+        driver,
+        EC.element_to_be_clickable((By.ID, "mx38-lb4")),
+        "el botón de descarga (mx38-lb4)",
     )
-    if not files:
-        logging.warning("No se encontró archivo .xls en la carpeta de descargas.")
-        return None
+    driver.execute_script("arguments[0].click();", download_button)
+    file_path = wait_for_download(download_dir, cfg.download_timeout_sec)
+    logging.info(f"Archivo descargado: {file_path}")
+    return file_path
 
-    latest_file = os.path.join(download_dir, files[0])
-    new_location = os.path.join(dest_folder, files[0])
-    shutil.move(latest_file, new_location)
+
+def archive_export(file_path, prefix=""):
+    """Mueve el fichero ya procesado a cfg.dest_folder (último export de cada nombre)."""
+    dest_folder = load_config().dest_folder
+    os.makedirs(dest_folder, exist_ok=True)
+    new_location = os.path.join(dest_folder, prefix + os.path.basename(file_path))
+    shutil.move(file_path, new_location + ".tmp")
+    os.replace(new_location + ".tmp", new_location)
     logging.info(f"Archivo movido a {new_location}")
     return new_location
 
 
-def process_html_table(file_path):
+def iter_export(file_path):
+    """Filas del export en streaming, listas para merge_rows."""
     logging.info(f"Procesando archivo: {file_path}")
-    dfs = pd.read_html(file_path)
-
-    df = dfs[0].iloc[1:, [0, 12, 15, 2, 3, 9, 5, 13]].copy()
-    df.columns = ["OT", "Descripción", "Nº de serie", "Fecha", "Cliente",
-                  "Tipo de trabajo", "Seguimiento", "Planta"]
-    df["Fecha"] = pd.to_datetime(df["Fecha"],
-                                 format="%d/%m/%y %H:%M:%S",
-                                 errors="coerce").dt.strftime("%Y-%m-%d")
-    df["Planta"] = df["Planta"].fillna("").astype(str).str.strip()
-    df = df.where(pd.notnull(df), None)
+    count = 0
+    for row in iter_export_rows(file_path):
+        count += 1
+        yield row
+    logging.info(f"Archivo procesado: {count} filas.")
 
-    # Clientes únicos (para el combo de la GUI)
-    unique_clients = [c.replace(" ", " ").strip() for c in df["Cliente"].dropna().unique().tolist()]
-    with open("clientes_unicos.txt", "w", encoding="utf-8") as f:
-        f.write("\n".join(unique_clients))
-
-    logging.info("Archivo procesado.")
-    return df
 
+def process_html_table(file_path):
+    """Export completo como DataFrame (columnas de la BD)."""
+    import pandas as pd
 
-def open_ot(ot: str, headless: bool = False):
-    """
-    Abre Maximo, entra en la aplicación de OT favorita y busca una OT concreta.
+    return pd.DataFrame(list(iter_export(file_path)), columns=list(MAXIMO_COLUMNS))
 
-    Para evitar que en la versión .exe (Nuitka) se cierre la ventana de Edge:
-    - Si headless=False (visible), devolvemos (driver, profile_dir) y NO cerramos aquí.
-      La GUI debe conservar la referencia y decidir cuándo cerrar/limpiar.
-    - Si headless=True, cerramos y eliminamos el perfil temporal.
-    """
-    profile_dir = tempfile.mkdtemp(prefix="maximo-ot-")
-    logging.info(f"OT {ot}: usando perfil temporal {profile_dir}")
 
-    driver = setup_driver(headless=headless, profile_dir=profile_dir)
+def search_ot(driver, ot: str):
+    """Con la app de OT abierta, busca la OT en el cuadro de búsqueda rápida."""
+    wait = WebDriverWait(driver, 30)
     try:
-        login(driver)
-        logging.info("Login OK, abriendo aplicación de órdenes de trabajo favoritas...")
+        search_box = wait.until(EC.presence_of_element_located((By.ID, "quicksearch")))
+    except TimeoutException:
+        logging.warning("No se encontró el cuadro de búsqueda rápida (id 'quicksearch')")
+        raise RuntimeError(
+            "No se encontró el cuadro de búsqueda rápida (id 'quicksearch') "
+            "después de abrir la app de OT. Comprueba que la página se ha "
+            "cargado correctamente o si ha cambiado el identificador."
+        )
 
-        open_workorders_app(driver)
+    search_box.clear()
+    search_box.send_keys(ot)
+    search_box.send_keys(Keys.RETURN)
+    logging.info(f"OT {ot} enviada a Maximo.")
 
-        wait = WebDriverWait(driver, 30)
-        try:
-            search_box = wait.until(EC.presence_of_element_located((By.ID, "quicksearch")))
-        except TimeoutException:
-            logging.warning("No se encontró el cuadro de búsqueda rápida (id 'quicksearch')")
-            raise RuntimeError(
-                "No se encontró el cuadro de búsqueda rápida (id 'quicksearch') "
-                "después de abrir la app de OT. Comprueba que la página se ha "
-                "cargado correctamente o si ha cambiado el identificador."
-            )
-
-        search_box.clear()
-        search_box.send_keys(ot)
-        search_box.send_keys(Keys.RETURN)
-        logging.info(f"OT {ot} enviada a Maximo.")
 
-        if headless:
-            driver.quit()
-            shutil.rmtree(profile_dir, ignore_errors=True)
-            logging.info(f"OT {ot}: navegador cerrado y perfil {profile_dir} eliminado (headless)")
-            return None
+# Maximo muestra los datos del registro en inputs: buscamos uno con el valor de la OT
+RECORD_SHOWN_JS = """
+    var inputs = document.querySelectorAll("input");
+    for (var i = 0; i < inputs.length; i++) {
+        if (inputs[i].value === arguments[0]) { return true; }
+    }
+    return false;
+"""
 
-        # Visible: devolvemos para que la GUI mantenga viva la sesión.
-        return driver, profile_dir
 
-    except Exception:
-        logging.exception(f"Error al abrir OT en Maximo (OT={ot})")
-        try:
-            driver.quit()
-        except Exception:
-            pass
-        shutil.rmtree(profile_dir, ignore_errors=True)
-        raise
+def build_ot_url(ot: str, cfg=None) -> str:
+    """
+    Enlace directo a una OT: carga la app cfg.ot_link_app y aplica la consulta
+    wonum=<OT>, sin pasar por el centro de inicio ni la búsqueda rápida.
+    """
+    if cfg is None:
+        cfg = load_config()
+    params = urllib.parse.urlencode({
+        "event": "loadapp",
+        "value": cfg.ot_link_app.lower(),
+        "additionalevent": "useqbe",
+        "additionaleventvalue": f"wonum={ot}",
+    })
+    return cfg.maximo_url.rstrip("/") + "/ui/?" + params
+
+
+def open_ot_direct(driver, ot: str) -> bool:
+    """
+    Navega directamente a la OT en una sesión ya iniciada. Devuelve False si
+    Maximo no muestra la OT (enlace desactivado, sesión caducada, app distinta...)
+    para que el llamante use el flujo de búsqueda rápida.
+    """
+    cfg = load_config()
+    if not cfg.ot_deep_link_enabled:
+        return False
+    driver.get(build_ot_url(ot, cfg))
+    try:
+        wait_for(
+            driver,
+            EC.any_of(
+                EC.presence_of_element_located((By.ID, "username")),
+                EC.presence_of_element_located((By.ID, "quicksearch")),
+            ),
+            f"la OT {ot}",
+        )
+        if on_login_page(driver):
+            return False
+        wait_for_maximo_idle(driver)
+        wait_for(
+            driver,
+            lambda d: d.execute_script(RECORD_SHOWN_JS, ot),
+            f"la OT {ot} en pantalla",
+            timeout=BUSY_APPEAR_TIMEOUT_SEC,
+        )
+    except RuntimeError:
+        logging.info(f"OT {ot}: el enlace directo no funcionó, usando búsqueda rápida")
+        return False
+    logging.info(f"OT {ot} abierta con enlace directo.")
+    return True
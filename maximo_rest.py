@@ -0,0 +1,227 @@
+# maximo_rest.py
+"""
+Sincronización sin navegador: lee las OT por la API REST/OSLC de Maximo.
+
+Se selecciona con cfg.sync_backend = "rest". Usa una sesión HTTP con cookies
+(login con la cabecera maxauth) y recorre el object structure página a página,
+pasando las filas directamente al merge de la BD.
+"""
+from __future__ import annotations
+
+import base64
+import http.cookiejar
+import json
+import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from config import AppConfig, load_config
+from db import MAXIMO_COLUMNS, MergeResult, get_sync_state, set_sync_state
+from sync_metrics import merge_timed, span
+
+# Claves de sync_state del backend REST
+STATE_WATERMARK = "rest.watermark"
+STATE_LAST_FULL = "rest.last_full_sync"
+STATE_SCOPE = "rest.scope"
+
+
+class MaximoRestSession:
+    """Sesión HTTP persistente contra la API OSLC de Maximo."""
+
+    def __init__(self, base_url: str, username: str, password: str, timeout_sec: int = 60):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.username = username
+        self.password = password
+        self.timeout_sec = timeout_sec
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar())
+        )
+        self.logged_in = False
+        self.bytes_received = 0
+
+    def _request(self, url: str, headers: dict | None = None) -> bytes:
+        req = urllib.request.Request(
+            url,
+            headers={"Accept": "application/json", "User-Agent": "maximo-client-v2", **(headers or {})},
+            method="GET",
+        )
+        with self._opener.open(req, timeout=self.timeout_sec) as resp:
+            body = resp.read()
+        self.bytes_received += len(body)
+        return body
+
+    def login(self):
+        token = base64.b64encode(f"{self.username}:{self.password}".encode("utf-8")).decode("ascii")
+        logging.info("REST: iniciando sesión en Maximo...")
+        try:
+            self._request(self.base_url + "oslc/login", headers={"maxauth": token})
+        except urllib.error.HTTPError as e:
+            if e.code in (401, 403):
+                raise RuntimeError(
+                    "Login rechazado por Maximo, compruebe que sus credenciales son correctas "
+                    "y Máximo funciona correctamente."
+                ) from None
+            raise RuntimeError(f"Error HTTP {e.code} al iniciar sesión en Maximo.") from None
+        self.logged_in = True
+        logging.info("REST: login correcto.")
+
+    def get_json(self, url: str) -> dict:
+        """GET de una URL (absoluta o relativa a maximo_url). Repite el login si caduca la sesión."""
+        if not url.startswith(("http://", "https://")):
+            url = self.base_url + url.lstrip("/")
+        if not self.logged_in:
+            self.login()
+        try:
+            return json.loads(self._request(url).decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            if e.code != 401:
+                raise RuntimeError(f"Error HTTP {e.code} leyendo {url}") from None
+        logging.info("REST: sesión caducada, repitiendo login...")
+        self.login()
+        return json.loads(self._request(url).decode("utf-8"))
+
+    def iter_records(self, object_structure: str, select: list[str], where: str,
+                     page_size: int) -> Iterator[dict]:
+        """Recorre todas las páginas del object structure siguiendo responseInfo.nextPage."""
+        params = {
+            "lean": "1",
+            "oslc.select": ",".join(select),
+            "oslc.pageSize": str(page_size),
+        }
+        if where:
+            params["oslc.where"] = where
+        url = f"oslc/os/{object_structure}?" + urllib.parse.urlencode(params)
+
+        page = 0
+        while url:
+            page += 1
+            data = self.get_json(url)
+            members = data.get("member") or []
+            logging.debug(f"REST: página {page} con {len(members)} registros")
+            yield from members
+            url = ((data.get("responseInfo") or {}).get("nextPage") or {}).get("href")
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace('"', '\\"') + '"'
+
+
+def build_where(filters: dict, field_map: dict) -> str:
+    """
+    Traduce filtros por columna al oslc.where. Igual que en la web de Maximo,
+    "=X" es coincidencia exacta y "X" busca el texto en cualquier posición.
+    """
+    clauses = []
+    for column, value in filters.items():
+        attr = field_map[column]
+        value = str(value).strip()
+        if value.startswith("="):
+            clauses.append(f"{attr}={_quote(value[1:])}")
+        else:
+            clauses.append(f"{attr}={_quote('%' + value + '%')}")
+    return " and ".join(clauses)
+
+
+def _format_value(column: str, value) -> str | None:
+    if value is None:
+        return None
+    value = str(value)
+    if column == "Fecha":
+        # ISO 8601 ("2025-03-01T10:22:00+01:00") -> "2025-03-01", como el export
+        return value[:10] or None
+    return value
+
+
+class _Watermark:
+    """Guarda el mayor valor del campo de cambio visto mientras se recorren los registros."""
+
+    def __init__(self, value: str | None = None):
+        self.value = value
+
+    def see(self, value):
+        if value and (self.value is None or str(value) > self.value):
+            self.value = str(value)
+
+
+def iter_rows(session: MaximoRestSession, cfg: AppConfig, since: str | None = None,
+              watermark: _Watermark | None = None) -> Iterator[tuple]:
+    """
+    Filas (en el orden de MAXIMO_COLUMNS) de las OT que cumplen cfg.rest_filters.
+    Con since, solo las modificadas desde esa marca de agua (cfg.rest_change_field).
+    """
+    field_map = cfg.rest_field_map
+    change_field = cfg.rest_change_field
+    select = list(dict.fromkeys([field_map[c] for c in MAXIMO_COLUMNS] + [change_field]))
+    where = build_where(cfg.rest_filters, field_map)
+    if since:
+        # >= para no perder cambios con la misma marca de tiempo (el merge es idempotente)
+        where = " and ".join(w for w in (where, f"{change_field}>={_quote(since)}") if w)
+    for record in session.iter_records(cfg.rest_object_structure, select, where, cfg.rest_page_size):
+        if watermark is not None:
+            watermark.see(record.get(change_field))
+        yield tuple(_format_value(c, record.get(field_map[c])) for c in MAXIMO_COLUMNS)
+
+
+def _sync_scope(cfg: AppConfig) -> str:
+    """Identifica lo que se sincroniza: si cambia, la marca de agua ya no vale."""
+    return json.dumps(
+        [cfg.maximo_url, cfg.rest_object_structure, cfg.rest_filters, cfg.rest_change_field],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+
+
+def _needs_full_sync(cfg: AppConfig, scope: str, watermark: str | None, now: datetime) -> bool:
+    if not cfg.delta_sync_enabled or not watermark:
+        return True
+    if get_sync_state(STATE_SCOPE) != scope:
+        return True
+    last_full = get_sync_state(STATE_LAST_FULL)
+    try:
+        last_full_dt = datetime.fromisoformat(last_full) if last_full else None
+    except ValueError:
+        last_full_dt = None
+    return last_full_dt is None or now - last_full_dt >= timedelta(hours=cfg.full_sync_interval_hours)
+
+
+def run_rest_update(cfg: AppConfig | None = None) -> MergeResult:
+    """
+    Sincroniza la BD leyendo de la API REST. Devuelve el MergeResult del merge.
+
+    Normalmente pide solo las OT cambiadas desde la última marca de agua; cada
+    cfg.full_sync_interval_hours (o si cambian los filtros) hace una
+    sincronización completa que además elimina las OT que ya no existen.
+    """
+    if cfg is None:
+        cfg = load_config()
+    if not cfg.username or not cfg.password:
+        logging.warning("No hay credenciales configuradas.")
+        raise RuntimeError("No hay credenciales configuradas.")
+
+    now = datetime.now()
+    scope = _sync_scope(cfg)
+    previous = get_sync_state(STATE_WATERMARK)
+    full = _needs_full_sync(cfg, scope, previous, now)
+    since = None if full else previous
+    logging.info(f"REST: sincronización {'completa' if full else f'incremental desde {since}'}")
+
+    session = MaximoRestSession(cfg.maximo_url, cfg.username, cfg.password, cfg.rest_timeout_sec)
+    with span("login"):
+        session.login()
+    watermark = _Watermark(previous if since else None)
+    result = merge_timed(
+        iter_rows(session, cfg, since=since, watermark=watermark),
+        read_phase="fetch",
+        read_bytes=lambda: session.bytes_received,
+        delete_missing=full and cfg.full_sync_deletes_missing,
+    )
+
+    state = {STATE_WATERMARK: watermark.value, STATE_SCOPE: scope}
+    if full:
+        state[STATE_LAST_FULL] = now.isoformat(timespec="seconds")
+    set_sync_state(state)
+    logging.info("Actualización de base de datos (REST) completada.")
+    return result
@@ -0,0 +1,226 @@
+# ot_pool.py
+import logging
+import shutil
+import tempfile
+import threading
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
+
+from config import load_config
+from maximo_client import (
+    setup_driver,
+    driver_alive,
+    on_login_page,
+    wait_for,
+    login,
+    open_workorders_app,
+    search_ot,
+    open_ot_direct,
+)
+
+REAPER_INTERVAL_SEC = 60
+
+
+class OtBrowser:
+    """Un Edge visible con la sesión de Maximo iniciada."""
+
+    def __init__(self, driver, profile_dir):
+        self.driver = driver
+        self.profile_dir = profile_dir
+        self.last_used = time.monotonic()
+        # True mientras la pestaña actual sigue en la app de OT sin usar
+        self.parked = True
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        logging.info(f"OT pool: navegador cerrado y perfil {self.profile_dir} eliminado")
+
+
+class OtBrowserPool:
+    """
+    Navegadores visibles reutilizables para abrir OTs.
+
+    - warm_up() lanza en segundo plano navegadores con la sesión iniciada y la
+      app de OT abierta (minimizados hasta que se usan).
+    - open_ot() reutiliza uno libre: cada OT se abre en una pestaña nueva del
+      mismo navegador. Solo se lanza otro Edge si todos están ocupados.
+    - Los navegadores aparcados sin usar durante cfg.ot_pool_idle_timeout_min
+      se cierran; los que muestran una OT solo se cierran si el usuario cierra
+      la ventana.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle: list[OtBrowser] = []
+        self._busy: list[OtBrowser] = []
+        self._warming = 0
+        self._closed = False
+        self._stop = threading.Event()
+        self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+        self._reaper.start()
+
+    # ---------- Ciclo de vida ----------
+    def _launch(self) -> OtBrowser:
+        profile_dir = tempfile.mkdtemp(prefix="maximo-ot-")
+        logging.info(f"OT pool: lanzando navegador con perfil {profile_dir}")
+        driver = setup_driver(headless=False, profile_dir=profile_dir)
+        browser = OtBrowser(driver, profile_dir)
+        try:
+            login(driver)
+            open_workorders_app(driver)
+        except Exception:
+            browser.quit()
+            raise
+        return browser
+
+    def warm_up(self, count=None):
+        """Precalienta en segundo plano hasta tener count navegadores (cfg.ot_pool_prewarm)."""
+        if count is None:
+            count = load_config().ot_pool_prewarm
+        with self._lock:
+            missing = count - len(self._idle) - len(self._busy) - self._warming
+            self._warming += max(0, missing)
+        for _ in range(max(0, missing)):
+            threading.Thread(target=self._warm_one, daemon=True).start()
+
+    def _warm_one(self):
+        try:
+            browser = self._launch()
+            try:
+                browser.driver.minimize_window()
+            except WebDriverException:
+                pass
+        except Exception:
+            logging.warning("OT pool: no se pudo precalentar un navegador", exc_info=True)
+            return
+        finally:
+            with self._lock:
+                self._warming -= 1
+        self._release(browser)
+        logging.info("OT pool: navegador precalentado listo")
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                browser = self._idle.pop()
+                self._busy.append(browser)
+            if driver_alive(browser.driver):
+                return browser
+            # El usuario ha cerrado la ventana
+            self._discard(browser)
+
+    def _release(self, browser: OtBrowser):
+        browser.last_used = time.monotonic()
+        with self._lock:
+            if browser in self._busy:
+                self._busy.remove(browser)
+            if self._closed:
+                browser.quit()
+                return
+            self._idle.append(browser)
+
+    def _discard(self, browser: OtBrowser):
+        with self._lock:
+            if browser in self._busy:
+                self._busy.remove(browser)
+        browser.quit()
+
+    def _reap_loop(self):
+        while not self._stop.wait(REAPER_INTERVAL_SEC):
+            timeout = load_config().ot_pool_idle_timeout_min * 60
+            now = time.monotonic()
+            with self._lock:
+                # Solo los aparcados sin usar: una ventana con una OT abierta
+                # no está inactiva aunque no se haya vuelto a pedir (el usuario
+                # la puede estar leyendo). Esas se revisan por si las ha cerrado.
+                expired = [b for b in self._idle if b.parked and now - b.last_used >= timeout]
+                shown = [b for b in self._idle if not b.parked]
+                self._idle = [b for b in self._idle if b not in expired and b not in shown]
+            for browser in expired:
+                logging.info("OT pool: cerrando navegador inactivo")
+                browser.quit()
+            for browser in shown:
+                if driver_alive(browser.driver):
+                    self._release(browser)
+                else:
+                    logging.info("OT pool: el usuario ha cerrado el navegador")
+                    browser.quit()
+
+    def close(self):
+        """Cierra todos los navegadores (al salir de la app)."""
+        self._stop.set()
+        with self._lock:
+            self._closed = True
+            browsers = self._idle + self._busy
+            self._idle, self._busy = [], []
+        for browser in browsers:
+            browser.quit()
+
+    # ---------- Abrir OT ----------
+    def _show_ot(self, browser: OtBrowser, ot: str):
+        driver = browser.driver
+        if browser.parked:
+            # La app de OT ya está abierta: basta con la búsqueda rápida
+            self._focus(browser)
+            search_ot(driver, ot)
+            return
+
+        # Pestaña nueva en el mismo navegador (la sesión se comparte)
+        driver.switch_to.new_window("tab")
+        self._focus(browser)
+        if open_ot_direct(driver, ot):
+            return
+
+        # Alternativa: centro de inicio -> app de OT -> búsqueda rápida
+        driver.get(load_config().maximo_url)
+        wait_for(
+            driver,
+            EC.any_of(
+                EC.presence_of_element_located((By.ID, "username")),
+                EC.presence_of_element_located((By.ID, "FavoriteApp_WO_TR")),
+            ),
+            "la página de inicio de Maximo",
+        )
+        if on_login_page(driver):
+            login(driver)
+        open_workorders_app(driver)
+        search_ot(driver, ot)
+
+    @staticmethod
+    def _focus(browser: OtBrowser):
+        browser.parked = False
+        try:
+            browser.driver.maximize_window()
+        except WebDriverException:
+            pass
+
+    def open_ot(self, ot: str):
+        for attempt in (1, 2):
+            browser = self._acquire()
+            if browser is None:
+                logging.info("OT pool: no hay navegadores libres, lanzando uno nuevo")
+                browser = self._launch()
+                with self._lock:
+                    self._busy.append(browser)
+            try:
+                self._show_ot(browser, ot)
+            except WebDriverException:
+                self._discard(browser)
+                if attempt == 2:
+                    raise
+                logging.warning(f"OT pool: navegador caído al abrir la OT {ot}, reintentando", exc_info=True)
+                continue
+            except Exception:
+                self._discard(browser)
+                raise
+            self._release(browser)
+            return
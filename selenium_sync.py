@@ -0,0 +1,298 @@
+# selenium_sync.py
+"""
+Sincronización con Selenium: Edge exporta el listado de OT de cada perfil de
+filtro y el export se fusiona con la BD.
+
+Lo importa updater solo con cfg.sync_backend = "selenium", así que el backend
+REST no necesita selenium ni lxml.
+"""
+from maximo_client import (
+    setup_driver,
+    driver_alive,
+    on_login_page,
+    wait_for,
+    login,
+    open_workorders_app,
+    apply_filter,
+    download_file,
+    archive_export,
+    iter_export,
+)
+from config import load_config
+from db import MergeResult, get_sync_state, merge_rows, set_sync_state
+from export_parser import export_digest
+from sync_metrics import merge_timed, span
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
+from typing import NamedTuple
+import logging
+import os
+import tempfile
+import shutil
+import threading
+
+# Nombre del perfil cuando no hay cfg.filter_profiles (solo cfg.filters)
+DEFAULT_PROFILE = "default"
+
+# Clave de sync_state (+ nombre del perfil) con el SHA-256 del último export fusionado
+STATE_EXPORT_DIGEST = "selenium.export_sha256."
+
+
+class Profile(NamedTuple):
+    """Perfil de filtro: un export de Maximo con sus propios filtros."""
+    name: str
+    filters: dict
+    # Campos de filtro de todos los perfiles: hay que vaciar los que no son
+    # de este (el navegador puede venir de exportar otro perfil)
+    clear_fields: tuple
+
+
+def filter_profiles(cfg) -> list[Profile]:
+    """Perfiles de cfg.filter_profiles o, si no hay, uno solo con cfg.filters."""
+    profiles = cfg.filter_profiles or {DEFAULT_PROFILE: cfg.filters}
+    all_fields = tuple(dict.fromkeys(f for filters in profiles.values() for f in filters))
+    return [Profile(name, dict(filters), all_fields) for name, filters in profiles.items()]
+
+
+def _export_and_merge(driver, download_dir, profile: Profile, stream: bool = True):
+    """
+    Con la app de OT abierta: filtra, descarga, procesa y fusiona con la BD.
+    stream=False parsea el export entero antes de fusionar (perfiles en
+    paralelo: el parseo no retiene el escritor de la BD).
+    Si el export es idéntico (SHA-256) al último fusionado de ese perfil, no
+    se parsea ni se fusiona.
+    """
+    with span("filter"):
+        apply_filter(driver, profile.filters, profile.clear_fields)
+    with span("download") as record:
+        file_path = download_file(driver, download_dir)
+        record["bytes"] = os.path.getsize(file_path)
+    state_key = STATE_EXPORT_DIGEST + profile.name
+    with span("digest") as record:
+        digest = export_digest(file_path)
+        record["unchanged"] = unchanged = digest == get_sync_state(state_key)
+    if unchanged:
+        logging.info(f"Export del perfil {profile.name} idéntico al anterior: sin parseo ni merge")
+        result = MergeResult(0, 0)
+    else:
+        if stream:
+            result = merge_timed(iter_export(file_path), profile=profile.name)
+        else:
+            with span("parse") as record:
+                rows = list(iter_export(file_path))
+                record["rows"] = len(rows)
+            with span("merge") as record:
+                result = merge_rows(rows, profile=profile.name)
+                record.update(rows=len(rows), new=result.new_entries, updated=result.updated_entries)
+        # Solo tras un merge correcto: si falla, el próximo export se procesa entero
+        set_sync_state({state_key: digest})
+    with span("archive"):
+        prefix = "" if profile.name == DEFAULT_PROFILE else f"{profile.name}_"
+        archive_export(file_path, prefix=prefix)
+    logging.info(f"Actualización de base de datos completada (perfil {profile.name}).")
+    return result
+
+
+def run_selenium_update(headless=True, profile: Profile = None, stream: bool = True):
+    if profile is None:
+        profile = filter_profiles(load_config())[0]
+    profile_dir = tempfile.mkdtemp(prefix="maximo-update-")
+    # Carpeta de descarga exclusiva de esta sincronización
+    download_dir = tempfile.mkdtemp(prefix="maximo-download-")
+    logging.info(f"Updater: usando perfil temporal {profile_dir} y descargas en {download_dir}")
+    driver = None
+    try:
+        with span("edge_start"):
+            driver = setup_driver(headless=headless, profile_dir=profile_dir, download_dir=download_dir)
+        with span("login"):
+            login(driver)
+        with span("navigate"):
+            open_workorders_app(driver)
+        return _export_and_merge(driver, download_dir, profile, stream)
+    finally:
+        try:
+            if driver is not None:
+                driver.quit()
+        finally:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            shutil.rmtree(download_dir, ignore_errors=True)
+            logging.info(f"Updater: navegador cerrado y perfil {profile_dir} eliminado")
+
+        logging.info("Navegador cerrado.")
+
+
+class SyncSession:
+    """
+    Edge headless de larga duración para el auto-update: se inicia sesión una
+    vez y el navegador queda aparcado en la app de OT entre sincronizaciones.
+
+    Antes de cada sincronización comprueba que el navegador sigue vivo (si no,
+    lo relanza) y que la sesión de Maximo no ha caducado (si no, repite el login).
+
+    Cada navegador descarga en su propia carpeta (fijada en las prefs al
+    lanzarlo), nunca en la cfg.download_dir compartida con otras sesiones.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.driver = None
+        self.profile_dir = None
+        self.download_dir = None
+
+    def _launch(self):
+        self._quit()
+        self.profile_dir = tempfile.mkdtemp(prefix="maximo-sync-")
+        self.download_dir = tempfile.mkdtemp(prefix="maximo-download-")
+        logging.info(
+            f"SyncSession: lanzando navegador con perfil {self.profile_dir} "
+            f"y descargas en {self.download_dir}"
+        )
+        with span("edge_start"):
+            self.driver = setup_driver(
+                headless=True, profile_dir=self.profile_dir, download_dir=self.download_dir
+            )
+        with span("login"):
+            login(self.driver)
+        with span("navigate"):
+            open_workorders_app(self.driver)
+
+    def _quit(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+            self.driver = None
+        if self.profile_dir is not None:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            logging.info(f"SyncSession: navegador cerrado y perfil {self.profile_dir} eliminado")
+            self.profile_dir = None
+        if self.download_dir is not None:
+            shutil.rmtree(self.download_dir, ignore_errors=True)
+            self.download_dir = None
+
+    def _clear_downloads(self):
+        """Vacía la carpeta de descarga (restos de un intento fallido)."""
+        for name in os.listdir(self.download_dir):
+            path = os.path.join(self.download_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    def _parked(self, filters: dict) -> bool:
+        """True si seguimos en la app de OT con los campos de filtro a mano."""
+        first_field = next(iter(filters), None)
+        return (
+            first_field is not None
+            and not on_login_page(self.driver)
+            and bool(self.driver.find_elements(By.ID, first_field))
+        )
+
+    def _ensure_ready(self, filters: dict):
+        with span("session_check"):
+            alive = self.driver is not None and driver_alive(self.driver)
+            parked = alive and self._parked(filters)
+        if not alive:
+            if self.driver is not None:
+                logging.warning("SyncSession: el navegador no responde, relanzando...")
+            self._launch()
+            return
+        if parked:
+            return
+
+        # Volvemos a la página de inicio: o muestra el login (sesión caducada)
+        # o el centro de inicio con el acceso a la app de OT.
+        with span("navigate"):
+            self.driver.get(load_config().maximo_url)
+            wait_for(
+                self.driver,
+                EC.any_of(
+                    EC.presence_of_element_located((By.ID, "username")),
+                    EC.presence_of_element_located((By.ID, "FavoriteApp_WO_TR")),
+                ),
+                "la página de inicio de Maximo",
+            )
+        if on_login_page(self.driver):
+            logging.info("SyncSession: sesión de Maximo caducada, repitiendo login...")
+            with span("login"):
+                login(self.driver)
+        with span("navigate"):
+            open_workorders_app(self.driver)
+
+    def run(self, profile: Profile, stream: bool = True):
+        """Sincroniza el perfil reutilizando el navegador. Devuelve el MergeResult."""
+        with self._lock:
+            try:
+                for attempt in (1, 2):
+                    try:
+                        self._ensure_ready(profile.filters)
+                        self._clear_downloads()
+                        return _export_and_merge(self.driver, self.download_dir, profile, stream)
+                    except WebDriverException:
+                        # Navegador caído a mitad: un reintento con uno nuevo
+                        if attempt == 2:
+                            raise
+                        logging.warning("SyncSession: fallo del navegador, relanzando", exc_info=True)
+                        self._quit()
+            except Exception:
+                # Estado desconocido: la próxima sincronización empieza de cero
+                self._quit()
+                raise
+
+    def close(self):
+        if self._lock.acquire(blocking=False):
+            try:
+                self._quit()
+            finally:
+                self._lock.release()
+            return
+        # Hay una sincronización en curso: no la esperamos (bloquearía la GUI).
+        # Cerramos el navegador; run() fallará y limpiará el perfil.
+        driver = self.driver
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+# Pool de sesiones: una por perfil que se sincroniza a la vez (como mucho
+# cfg.sync_workers). Las libres esperan aparcadas a la siguiente sincronización.
+_sync_sessions: list[SyncSession] = []
+_idle_sessions: list[SyncSession] = []
+_sync_session_lock = threading.Lock()
+
+
+def _acquire_session() -> SyncSession:
+    with _sync_session_lock:
+        if _idle_sessions:
+            return _idle_sessions.pop()
+        session = SyncSession()
+        _sync_sessions.append(session)
+        return session
+
+
+def _release_session(session: SyncSession):
+    with _sync_session_lock:
+        if session in _sync_sessions:  # no se ha cerrado mientras tanto
+            _idle_sessions.append(session)
+
+
+def run_in_session(profile: Profile, stream: bool) -> MergeResult:
+    session = _acquire_session()
+    try:
+        return session.run(profile, stream)
+    finally:
+        _release_session(session)
+
+
+def close_sync_sessions():
+    """Cierra los navegadores de sincronización, si existen (al salir de la app)."""
+    with _sync_session_lock:
+        sessions = list(_sync_sessions)
+        _sync_sessions.clear()
+        _idle_sessions.clear()
+    for session in sessions:
+        session.close()
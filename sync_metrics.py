@@ -0,0 +1,305 @@
+# sync_metrics.py
+"""
+Trazas por fases de cada sincronización.
+
+run_update abre una traza con trace_sync(); cada fase (arranque de Edge,
+login, navegación, filtro, descarga, parseo, merge...) se mide con span().
+Al terminar, la traza se añade como una línea JSON a cfg.metrics_file y, si
+cfg.metrics_prometheus_file está configurado, se escribe también en formato
+textfile de Prometheus (node_exporter).
+
+span() fuera de una sincronización no hace nada, así que las funciones de
+maximo_client/maximo_rest se pueden seguir usando sueltas.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, Optional
+
+from config import load_config
+from db import MergeResult, merge_rows
+
+# A partir de este tamaño el fichero de métricas se rota a .1
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+# Bytes del final del fichero que se leen para recuperar la última traza
+_TAIL_BYTES = 64 * 1024
+
+_local = threading.local()
+_last_trace: Optional[dict] = None
+_write_lock = threading.Lock()
+
+
+class SyncTrace:
+    """Fases medidas de una sincronización."""
+
+    def __init__(self, backend: str):
+        self.backend = backend
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self.spans: list[dict] = []
+        self.result: dict = {}
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[dict]:
+        """Mide el bloque. El dict devuelto admite atributos extra (rows, bytes...)."""
+        record = {"name": name, **attrs}
+        t0 = time.perf_counter()
+        try:
+            yield record
+            record["outcome"] = "ok"
+        except BaseException as e:
+            record["outcome"] = "error"
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["duration_s"] = round(time.perf_counter() - t0, 3)
+            self.spans.append(record)
+
+    def add_span(self, name: str, duration_s: float, **attrs):
+        """Añade una fase medida aparte (p.ej. el parseo, intercalado con el merge)."""
+        self.spans.append({"name": name, **attrs, "outcome": "ok", "duration_s": round(duration_s, 3)})
+
+    def to_dict(self, outcome: str, error: Optional[str] = None) -> dict:
+        data = {
+            "ts": self.started_at.isoformat(timespec="seconds"),
+            "backend": self.backend,
+            "outcome": outcome,
+            "duration_s": round(time.perf_counter() - self._t0, 3),
+            **self.result,
+            "spans": self.spans,
+        }
+        if error:
+            data["error"] = error
+        return data
+
+
+class TimedIter:
+    """Envuelve un iterable y acumula el tiempo pasado dentro de él y las filas producidas."""
+
+    def __init__(self, iterable: Iterable):
+        self._it = iter(iterable)
+        self.seconds = 0.0
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        t0 = time.perf_counter()
+        try:
+            item = next(self._it)
+        finally:
+            self.seconds += time.perf_counter() - t0
+        self.count += 1
+        return item
+
+
+def merge_timed(rows: Iterable, read_phase: str = "parse",
+                read_bytes: Optional[Callable[[], int]] = None, **merge_kw) -> MergeResult:
+    """
+    merge_rows midiendo aparte el tiempo de producir las filas (read_phase:
+    parseo del export, páginas REST...), que va intercalado con el merge.
+    read_bytes, si se pasa, da los bytes leídos en esa fase.
+    """
+    timed_rows = TimedIter(rows)
+    with span("merge") as record:
+        result = merge_rows(timed_rows, **merge_kw)
+        record.update(rows=timed_rows.count, new=result.new_entries, updated=result.updated_entries)
+    if "duration_s" in record:  # sin traza activa span() no mide nada
+        record["duration_s"] = round(max(0.0, record["duration_s"] - timed_rows.seconds), 3)
+    read_attrs = {"rows": timed_rows.count}
+    if read_bytes is not None:
+        read_attrs["bytes"] = read_bytes()
+    add_span(read_phase, timed_rows.seconds, **read_attrs)
+    return result
+
+
+def current_trace() -> Optional[SyncTrace]:
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def use_trace(trace: Optional[SyncTrace], **span_attrs):
+    """
+    Hace que los span() de este hilo (p.ej. un hilo del pool de perfiles) vayan
+    a trace, añadiendo span_attrs (p.ej. profile=...) a cada uno.
+    """
+    previous = current_trace(), getattr(_local, "span_attrs", {})
+    _local.trace, _local.span_attrs = trace, span_attrs
+    try:
+        yield
+    finally:
+        _local.trace, _local.span_attrs = previous
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[dict]:
+    """span() de la traza activa en este hilo (o nada si no hay sincronización en curso)."""
+    trace = current_trace()
+    if trace is None:
+        yield dict(attrs)
+        return
+    with trace.span(name, **getattr(_local, "span_attrs", {}), **attrs) as record:
+        yield record
+
+
+def add_span(name: str, duration_s: float, **attrs):
+    trace = current_trace()
+    if trace is not None:
+        trace.add_span(name, duration_s, **getattr(_local, "span_attrs", {}), **attrs)
+
+
+@contextmanager
+def trace_sync(backend: str) -> Iterator[SyncTrace]:
+    """Abre la traza de una sincronización y la guarda al terminar (con éxito o error)."""
+    trace = SyncTrace(backend)
+    _local.trace = trace
+    try:
+        yield trace
+    except BaseException as e:
+        _finish(trace.to_dict("error", f"{type(e).__name__}: {e}"))
+        raise
+    else:
+        _finish(trace.to_dict("ok"))
+    finally:
+        _local.trace = None
+
+
+def _finish(data: dict):
+    global _last_trace
+    _last_trace = data
+    logging.info("Sync: " + format_breakdown(data).replace("\n", " | "))
+    cfg = load_config()
+    if not cfg.metrics_enabled:
+        return
+    try:
+        with _write_lock:
+            if cfg.metrics_file:
+                _append_jsonl(cfg.metrics_file, data)
+            if cfg.metrics_prometheus_file:
+                write_prometheus(cfg.metrics_prometheus_file, data)
+    except OSError:
+        # Las métricas nunca deben hacer fallar la sincronización
+        logging.warning("No se pudieron guardar las métricas de sincronización", exc_info=True)
+
+
+def _append_jsonl(path: str, data: dict):
+    if os.path.exists(path) and os.path.getsize(path) >= METRICS_MAX_BYTES:
+        os.replace(path, path + ".1")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(data, ensure_ascii=False) + "\n")
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus(path: str, data: dict):
+    """Escribe la última traza en formato textfile de Prometheus (de forma atómica)."""
+    backend = _label(data["backend"])
+    ts = datetime.fromisoformat(data["ts"]).timestamp()
+    lines = [
+        "# HELP maximo_sync_last_run_timestamp_seconds Inicio de la última sincronización.",
+        "# TYPE maximo_sync_last_run_timestamp_seconds gauge",
+        f'maximo_sync_last_run_timestamp_seconds{{backend="{backend}"}} {ts:.0f}',
+        "# HELP maximo_sync_success 1 si la última sincronización terminó bien.",
+        "# TYPE maximo_sync_success gauge",
+        f'maximo_sync_success{{backend="{backend}"}} {1 if data["outcome"] == "ok" else 0}',
+        "# HELP maximo_sync_duration_seconds Duración total de la última sincronización.",
+        "# TYPE maximo_sync_duration_seconds gauge",
+        f'maximo_sync_duration_seconds{{backend="{backend}"}} {data["duration_s"]}',
+        "# HELP maximo_sync_phase_duration_seconds Duración de cada fase de la última sincronización.",
+        "# TYPE maximo_sync_phase_duration_seconds gauge",
+    ]
+    for (profile, name), seconds in _phase_totals(data).items():
+        lines.append(
+            f'maximo_sync_phase_duration_seconds{{backend="{backend}",profile="{_label(profile)}",'
+            f'phase="{_label(name)}"}} {seconds:.3f}'
+        )
+    lines += [
+        "# HELP maximo_sync_rows Filas de la última sincronización.",
+        "# TYPE maximo_sync_rows gauge",
+    ]
+    for kind in ("rows", "new", "updated"):
+        if kind in data:
+            lines.append(f'maximo_sync_rows{{backend="{backend}",kind="{kind}"}} {int(data[kind])}')
+    downloaded = sum(int(s.get("bytes", 0)) for s in data["spans"])
+    lines += [
+        "# HELP maximo_sync_download_bytes Bytes descargados en la última sincronización.",
+        "# TYPE maximo_sync_download_bytes gauge",
+        f'maximo_sync_download_bytes{{backend="{backend}"}} {downloaded}',
+    ]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".maximo_sync.", suffix=".prom.tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _phase_totals(data: dict) -> dict:
+    """
+    Segundos por (perfil, fase): las fases repetidas, p.ej. dos navegaciones,
+    se suman. Perfil "" para las fases comunes.
+    """
+    totals: dict[tuple, float] = {}
+    for s in data.get("spans", []):
+        key = (s.get("profile", ""), s["name"])
+        totals[key] = totals.get(key, 0.0) + s["duration_s"]
+    return totals
+
+
+def last_trace() -> Optional[dict]:
+    """Última traza: la de esta ejecución o, si aún no hay, la última del fichero."""
+    if _last_trace is not None:
+        return _last_trace
+    path = load_config().metrics_file
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - _TAIL_BYTES))
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    for line in reversed(lines):
+        try:
+            return json.loads(line.decode("utf-8"))
+        except (ValueError, UnicodeDecodeError):
+            continue  # línea cortada al leer solo el final
+    return None
+
+
+def format_breakdown(data: dict) -> str:
+    """Resumen legible de una traza (para el tooltip de la barra de estado)."""
+    status = "correcta" if data["outcome"] == "ok" else "con error"
+    lines = [f"Sincronización {data['ts'].replace('T', ' ')} ({data['backend']}) {status}: "
+             f"{data['duration_s']:.1f} s"]
+    for s in data.get("spans", []):
+        extra = []
+        if "rows" in s:
+            extra.append(f"{s['rows']} filas")
+        if "bytes" in s:
+            extra.append(f"{s['bytes'] / 1024:.0f} KiB")
+        if s.get("outcome") == "error":
+            extra.append(f"error {s.get('error', '')}".strip())
+        name = f"{s['profile']}/{s['name']}" if "profile" in s else s["name"]
+        lines.append(f"  {name}: {s['duration_s']:.2f} s" + (f" ({', '.join(extra)})" if extra else ""))
+    if "new" in data:
+        lines.append(f"Nuevas: {data['new']}, actualizadas: {data.get('updated', 0)}")
+    if data.get("error"):
+        lines.append(f"Error: {data['error']}")
+    return "\n".join(lines)
@@ -0,0 +1,178 @@
+# sync_scheduler.py
+"""
+Planificador de las sincronizaciones con Maximo (GUI y sync_service).
+
+- Una sola sincronización a la vez: lo que se pide mientras hay una en curso
+  (tick del auto-update, "Actualizar ahora") se une a esa en vez de lanzar
+  otro navegador y otro merge.
+- Tras un fallo se reintenta con espera exponencial y jitter.
+- Con adaptive=True el intervalo se acorta cuando la última sincronización
+  trajo cambios y se alarga cuando no (de noche acaba en el máximo), siempre
+  entre los límites configurados.
+"""
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+# Intervalo adaptativo: factor tras una sincronización con / sin cambios
+SPEEDUP_FACTOR = 0.5
+SLOWDOWN_FACTOR = 1.5
+# Jitter relativo (±) de las esperas de reintento
+RETRY_JITTER = 0.2
+
+
+def next_interval(current_s: float, changed: bool, min_s: float, max_s: float) -> float:
+    """Intervalo tras una sincronización correcta (con o sin cambios)."""
+    factor = SPEEDUP_FACTOR if changed else SLOWDOWN_FACTOR
+    return min(max_s, max(min_s, current_s * factor))
+
+
+def backoff_delay(failures: int, base_s: float, max_s: float, rng=random) -> float:
+    """Espera antes del reintento número `failures`: base * 2^(n-1), con tope y jitter."""
+    delay = min(max_s, base_s * 2 ** (failures - 1))
+    return delay * rng.uniform(1 - RETRY_JITTER, 1 + RETRY_JITTER)
+
+
+class SyncScheduler:
+    """
+    Hilo que ejecuta sync() cuando toca o cuando se pide con request().
+
+    Los callbacks se llaman desde el hilo del planificador (la GUI los pasa
+    a Tk con after):
+        on_start(manual), on_done(result, manual), on_error(exc, manual)
+    manual=True si alguien pidió la sincronización con request(), aunque
+    fuese uniéndose a una que ya estaba en curso.
+    """
+
+    def __init__(self, sync: Callable[[], object],
+                 on_start: Optional[Callable] = None,
+                 on_done: Optional[Callable] = None,
+                 on_error: Optional[Callable] = None):
+        self._sync = sync
+        self._on_start = on_start
+        self._on_done = on_done
+        self._on_error = on_error
+        self._cond = threading.Condition()
+        self._enabled = False
+        self._adaptive = True
+        self._interval_s = self._min_s = self._max_s = 600.0
+        self._retry_s = 30.0
+        self._due: Optional[float] = None  # time.monotonic() del próximo tick
+        self._requested = False
+        self._joined = False
+        self._running = False
+        self._failures = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name="sync-scheduler", daemon=True)
+        self._thread.start()
+
+    def configure(self, enabled: bool, interval_min: float, min_interval_min: float = None,
+                  max_interval_min: float = None, adaptive: bool = True, retry_sec: float = 30):
+        """(Re)programa el auto-update. Con enabled=False solo se sincroniza con request()."""
+        min_s = (min_interval_min or interval_min) * 60
+        max_s = max(min_s, (max_interval_min or interval_min) * 60)
+        with self._cond:
+            self._enabled = enabled
+            self._adaptive = adaptive
+            self._min_s, self._max_s = min_s, max_s
+            self._interval_s = min(max_s, max(min_s, interval_min * 60))
+            self._retry_s = retry_sec
+            self._failures = 0
+            if not self._running:
+                self._due = time.monotonic() + self._interval_s if enabled else None
+            self._cond.notify()
+
+    def request(self) -> bool:
+        """Pide una sincronización ya. False si se ha unido a la que está en curso."""
+        with self._cond:
+            if self._running:
+                self._joined = True
+                return False
+            self._requested = True
+            self._cond.notify()
+            return True
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def next_run_in(self) -> Optional[float]:
+        """Segundos hasta el próximo tick (None si no hay ninguno programado)."""
+        with self._cond:
+            if self._due is None:
+                return None
+            return max(0.0, self._due - time.monotonic())
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _wait_turn(self) -> Optional[bool]:
+        """Espera al tick o a una petición. Devuelve manual, o None si se cierra."""
+        with self._cond:
+            while not self._closed:
+                if self._requested:
+                    break
+                if self._due is not None and time.monotonic() >= self._due:
+                    break
+                timeout = None if self._due is None else self._due - time.monotonic()
+                self._cond.wait(timeout)
+            if self._closed:
+                return None
+            manual = self._requested
+            self._requested = self._joined = False
+            self._running = True
+            self._due = None
+            return manual
+
+    def _loop(self):
+        while True:
+            manual = self._wait_turn()
+            if manual is None:
+                return
+            self._emit(self._on_start, manual)
+            result = error = None
+            try:
+                result = self._sync()
+            except Exception as e:
+                error = e
+            with self._cond:
+                self._running = False
+                manual = manual or self._joined
+                delay = self._reschedule(result, error)
+            if delay is not None:
+                logging.info(f"Auto-update: próxima sincronización en {delay / 60:.1f} min")
+            if error is None:
+                self._emit(self._on_done, result, manual)
+            else:
+                self._emit(self._on_error, error, manual)
+
+    def _reschedule(self, result, error) -> Optional[float]:
+        """Calcula el próximo tick tras una sincronización (con el lock tomado)."""
+        if error is None:
+            self._failures = 0
+            if self._adaptive:
+                changed = getattr(result, "changed", True)
+                self._interval_s = next_interval(self._interval_s, changed, self._min_s, self._max_s)
+            delay = self._interval_s
+        else:
+            self._failures += 1
+            delay = backoff_delay(self._failures, self._retry_s, self._max_s)
+            logging.warning(f"Auto-update: fallo nº {self._failures} seguido, reintento con espera")
+        if not self._enabled:
+            self._due = None
+            return None
+        self._due = time.monotonic() + delay
+        return delay
+
+    @staticmethod
+    def _emit(callback, *args):
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception:
+            logging.exception("Auto-update: error en el aviso de la sincronización")
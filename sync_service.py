@@ -0,0 +1,330 @@
+# sync_service.py
+"""
+Servicio sin GUI: sincroniza con Maximo periódicamente y sirve la BD por una
+API HTTP/JSON de solo lectura, para que un solo equipo haga la sincronización
+y el resto solo consulte.
+
+No importa Tk. Uso:
+    python sync_service.py                   # sincroniza cada cfg.auto_update_interval_min y sirve la API
+    python sync_service.py --once            # una sincronización y sale
+    python sync_service.py --no-sync         # solo API (la BD la sincroniza otro proceso)
+    python sync_service.py --host 0.0.0.0 --port 8765 --interval 10
+
+API (GET):
+    /api/ots?q=&by=OT&cliente=Todos&desde=&hasta=&order=OT&desc=1&limit=200&offset=0&after=
+    /api/lookup/<Cliente|Planta|Seguimiento>
+    /api/status
+
+Las respuestas llevan ETag (versión de datos de la BD + consulta): con
+If-None-Match se responde 304 sin volver a consultar.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import signal
+import sys
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from config import load_config, flush_config, credentials_configured
+from db import (
+    LOOKUP_COLUMNS,
+    MAXIMO_COLUMNS,
+    close_all as close_db,
+    count_data,
+    fetch_data,
+    get_data_version,
+    get_lookup_values,
+    init_db,
+)
+from sync_metrics import last_trace
+from sync_scheduler import SyncScheduler
+
+# Máximo de filas por petición de /api/ots
+API_MAX_LIMIT = 1000
+API_DEFAULT_LIMIT = 200
+# Hilos que atienden la API (cada uno con su conexión lectora de SQLite)
+API_WORKERS = 8
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _int_param(params: dict, name: str, default: int, minimum: int = 0) -> int:
+    value = params.get(name, [""])[0]
+    if value == "":
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(400, f"{name} debe ser un entero") from None
+    if number < minimum:
+        raise ApiError(400, f"{name} debe ser >= {minimum}")
+    return number
+
+
+def query_ots(params: dict) -> dict:
+    """Parámetros de /api/ots -> fetch_data/count_data."""
+    def param(name, default=""):
+        return params.get(name, [default])[0]
+
+    order_by = param("order", "OT")
+    if order_by not in MAXIMO_COLUMNS:
+        raise ApiError(400, f"order debe ser una de {', '.join(MAXIMO_COLUMNS)}")
+    query = dict(
+        filter_text=param("q"),
+        search_by=param("by", "OT"),
+        client_filter=param("cliente", "Todos"),
+        date_from=param("desde") or None,
+        date_to=param("hasta") or None,
+    )
+    limit = min(_int_param(params, "limit", API_DEFAULT_LIMIT, minimum=1), API_MAX_LIMIT)
+    offset = _int_param(params, "offset", 0)
+    after = param("after") or None
+
+    try:
+        total = count_data(**query)
+        rows = fetch_data(
+            **query,
+            order_by=order_by,
+            descending=param("desc", "1") not in ("0", "false"),
+            limit=limit,
+            offset=0 if after else offset,
+            after=after,
+        )
+    except ValueError as e:  # search_by o fecha (YYYY-MM-DD) no válidos
+        raise ApiError(400, str(e)) from None
+    return {
+        "total": total,
+        "columns": list(MAXIMO_COLUMNS),
+        "rows": [dict(zip(MAXIMO_COLUMNS, row)) for row in rows],
+    }
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "MaximoSyncService/1.0"
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(_request_path(self.path))
+        params = urllib.parse.parse_qs(url.query)
+        try:
+            if url.path == "/api/status":
+                # Estado: sin caché (incluye la última sincronización)
+                self._send_json(200, self._status())
+                return
+
+            # ETag: misma versión de datos y misma consulta -> mismo contenido
+            version = get_data_version()
+            etag = '"' + hashlib.sha1(f"{version}|{self.path}".encode("utf-8")).hexdigest() + '"'
+            if etag in _parse_if_none_match(self.headers.get("If-None-Match")):
+                self._send_headers(304, etag=etag)
+                return
+
+            if url.path == "/api/ots":
+                body = query_ots(params)
+            elif url.path.startswith("/api/lookup/"):
+                kind = urllib.parse.unquote(url.path[len("/api/lookup/"):])
+                if kind not in LOOKUP_COLUMNS:
+                    raise ApiError(404, f"Sin tabla de valores: {kind}")
+                body = {"kind": kind, "values": get_lookup_values(kind)}
+            else:
+                raise ApiError(404, "Ruta desconocida")
+            self._send_json(200, body, etag=etag)
+        except ApiError as e:
+            self._send_json(e.status, {"error": str(e)})
+        except Exception:
+            logging.exception(f"API: error atendiendo {self.path}")
+            self._send_json(500, {"error": "Error interno"})
+
+    def _method_not_allowed(self):
+        self._send_json(405, {"error": "API de solo lectura"}, extra={"Allow": "GET"})
+
+    do_POST = do_PUT = do_PATCH = do_DELETE = _method_not_allowed
+
+    @staticmethod
+    def _status() -> dict:
+        return {"data_version": get_data_version(), "last_sync": last_trace()}
+
+    def _send_headers(self, status: int, etag: str = None, length: int = 0, extra: dict = None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if status != 304:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(length))
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _send_json(self, status: int, body: dict, etag: str = None, extra: dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self._send_headers(status, etag=etag, length=len(data), extra=extra)
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logging.debug("API: " + format % args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer con un pool fijo de hilos. A diferencia de ThreadingHTTPServer
+    (un hilo nuevo por petición) los hilos se reutilizan, y con ellos su
+    conexión lectora de la BD.
+    """
+
+    def __init__(self, address, handler_class, workers: int = API_WORKERS):
+        super().__init__(address, handler_class)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def _request_path(path: str) -> str:
+    # http.server decodifica la línea de petición como latin-1: si el cliente
+    # manda UTF-8 sin codificar ("Descripción"), lo recuperamos
+    try:
+        return path.encode("latin-1").decode("utf-8")
+    except UnicodeError:
+        return path
+
+
+def _parse_if_none_match(value: str) -> set:
+    if not value:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in value.split(",")}
+
+
+def _sync():
+    # Import diferido: selenium/lxml solo si de verdad se sincroniza
+    from updater import run_update
+
+    return run_update(headless=True)
+
+
+def _log_sync_done(result, manual):
+    logging.info(
+        f"Servicio: sincronización correcta (nuevas={result.new_entries}, "
+        f"actualizadas={result.updated_entries})"
+    )
+
+
+def _log_sync_error(error, manual):
+    logging.error("Servicio: error en la sincronización", exc_info=error)
+
+
+def run_sync_once() -> bool:
+    try:
+        result = _sync()
+    except Exception as e:
+        _log_sync_error(e, manual=True)
+        return False
+    _log_sync_done(result, manual=True)
+    return True
+
+
+def _raise_interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+
+def _shutdown():
+    updater = sys.modules.get("updater")
+    if updater is not None:
+        updater.close_sync_session()
+    close_db()
+    flush_config()
+
+
+def main(argv=None) -> int:
+    cfg = load_config()
+    parser = argparse.ArgumentParser(description="Sincronización con Maximo y API de consulta, sin GUI")
+    parser.add_argument("--once", action="store_true", help="sincroniza una vez y sale")
+    parser.add_argument("--no-sync", action="store_true", help="solo sirve la API")
+    parser.add_argument("--no-api", action="store_true", help="solo sincroniza")
+    parser.add_argument("--interval", type=float, default=cfg.auto_update_interval_min,
+                        help="minutos entre sincronizaciones")
+    parser.add_argument("--host", default=cfg.api_host)
+    parser.add_argument("--port", type=int, default=cfg.api_port)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[logging.FileHandler("maximo_sync_service.log"), logging.StreamHandler()],
+    )
+    init_db()
+
+    sync_enabled = not args.no_sync
+    if sync_enabled and not credentials_configured():
+        logging.error("No hay credenciales configuradas: configúrelas desde la app o en config.json.")
+        return 2
+
+    if args.once:
+        try:
+            return 0 if run_sync_once() else 1
+        finally:
+            _shutdown()
+
+    # SIGTERM (servicio/systemd) igual que Ctrl+C
+    signal.signal(signal.SIGTERM, _raise_interrupt)
+
+    scheduler = None
+    if sync_enabled:
+        # Una sincronización a la vez, reintentos con espera exponencial e
+        # intervalo adaptativo (ver sync_scheduler)
+        interval = max(1.0, args.interval)
+        scheduler = SyncScheduler(_sync, on_done=_log_sync_done, on_error=_log_sync_error)
+        scheduler.configure(
+            enabled=True,
+            interval_min=interval,
+            min_interval_min=min(cfg.auto_update_min_interval_min, interval),
+            max_interval_min=max(cfg.auto_update_max_interval_min, interval),
+            adaptive=cfg.auto_update_adaptive,
+            retry_sec=cfg.auto_update_retry_sec,
+        )
+        scheduler.request()  # la primera, ya
+        logging.info(f"Servicio: sincronizando cada {interval:g} min (adaptativo: {cfg.auto_update_adaptive})")
+
+    server = None
+    try:
+        if args.no_api:
+            # Espera con timeout: en Windows un wait() sin él no atiende Ctrl+C
+            idle = threading.Event()
+            while not idle.wait(1):
+                pass
+        else:
+            server = PooledHTTPServer((args.host, args.port), ApiHandler)
+            logging.info(f"Servicio: API en http://{args.host}:{args.port}/api/")
+            server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Servicio: parando...")
+    finally:
+        if scheduler is not None:
+            scheduler.close()
+        if server is not None:
+            server.server_close()
+        _shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+# tests/test_db.py
+"""
+Capa de datos (db.py) sobre una BD temporal: merge por lotes, borrado de las
+OT que faltan y etiquetas de perfil, migración de una BD antigua con OT
+sucias, búsqueda FTS5/LIKE, paginación por keyset y rango de fechas.
+
+    python -m unittest tests.test_db
+"""
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+import config
+import db
+
+
+def _row(ot: str, descripcion: str = "Reparación", fecha: str = "2025-03-01",
+         cliente: str = "ACME", serie: str = "SN1") -> tuple:
+    return (ot, descripcion, serie, fecha, cliente, "CM", "PENDIENTE", "LAB-BAD")
+
+
+class DbTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._saved_store = config._store
+        config._store = config.ConfigStore(f"{self._tmp.name}/config.json")
+        self.db_path = f"{self._tmp.name}/maximo_data.db"
+
+    def tearDown(self):
+        db.close_all()
+        config._store = self._saved_store
+        self._tmp.cleanup()
+
+    def _merge(self, rows, **kw) -> db.MergeResult:
+        return db.merge_rows(rows, db_path=self.db_path, **kw)
+
+    def _ots(self, order_by: str = "OT", **kw) -> list:
+        rows = db.fetch_data(kw.pop("filter_text", ""), kw.pop("search_by", "OT"),
+                             kw.pop("client_filter", "Todos"), order_by=order_by,
+                             db_path=self.db_path, **kw)
+        return [r[0] for r in rows]
+
+    def _query(self, sql: str, params=()) -> list:
+        return db.get_manager(self.db_path).reader().execute(sql, params).fetchall()
+
+
+class MergeTest(DbTestCase):
+    def test_new_updated_and_unchanged(self):
+        first = self._merge([_row("1001"), _row("1002"), _row("1003")])
+        self.assertEqual((first.new_entries, first.updated_entries), (3, 0))
+        self.assertEqual(first.new_ots, ("1001", "1002", "1003"))
+
+        result = self._merge([
+            _row("1001"),                                # sin cambios
+            _row("1002\u00a0", descripcion="Cambiada"),   # misma OT con NBSP
+            _row("1004"),
+        ])
+
+        new, updated = result  # sigue siendo la tupla (nuevas, actualizadas)
+        self.assertEqual((new, updated), (1, 1))
+        self.assertEqual(result.new_ots, ("1004",))
+        self.assertEqual(result.updated_ots, ("1002",))
+        self.assertEqual(result.deleted_ots, ())
+        self.assertEqual(self._query("SELECT Descripción FROM maximo WHERE OT = '1002'"), [("Cambiada",)])
+
+        self.assertFalse(self._merge([_row("1001"), _row("1004")]).changed)
+
+    def test_last_duplicate_wins_across_batches(self):
+        self._merge([_row("1001"), _row("1002")])
+        saved, db.MERGE_BATCH_SIZE = db.MERGE_BATCH_SIZE, 2
+        try:
+            # Cambiada en el primer lote e igual que en la BD en el último
+            unchanged = self._merge([_row("1001", descripcion="X"), _row("1002"), _row("1001")])
+            changed = self._merge([_row("1001"), _row("1002"), _row("1001", descripcion="Y")])
+        finally:
+            db.MERGE_BATCH_SIZE = saved
+
+        self.assertFalse(unchanged.changed)
+        self.assertEqual(changed.updated_ots, ("1001",))
+        self.assertEqual(self._query("SELECT Descripción FROM maximo WHERE OT = '1001'"), [("Y",)])
+
+    def test_delete_missing_with_profile(self):
+        self._merge([_row("1001"), _row("1002"), _row("1003")], profile="LAB-BAD")
+        self._merge([_row("1003"), _row("1004", cliente="OTRO")], profile="LAB-MAD")
+
+        result = self._merge([_row("1001"), _row("1002")], delete_missing=True, profile="LAB-BAD")
+
+        self.assertEqual(sorted(result.deleted_ots), ["1003", "1004"])
+        self.assertEqual(self._ots(), ["1001", "1002"])
+        self.assertEqual(
+            self._query("SELECT profile, OT FROM maximo_profile ORDER BY profile, OT"),
+            [("LAB-BAD", "1001"), ("LAB-BAD", "1002")],
+        )
+        self.assertEqual(db.get_lookup_values("Cliente", db_path=self.db_path), ["ACME"])
+
+
+class MigrationTest(DbTestCase):
+    def test_baseline_db_with_padded_duplicate_ots(self):
+        # BD de la versión original: solo la tabla maximo, con OT sucias
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("""
+            CREATE TABLE maximo (
+                OT TEXT PRIMARY KEY, Descripción TEXT, Nº_de_serie TEXT, Fecha TEXT,
+                Cliente TEXT, Tipo_de_trabajo TEXT, Seguimiento TEXT, Planta TEXT
+            )
+        """)
+        conn.executemany("INSERT INTO maximo VALUES (?, ?, ?, ?, ?, ?, ?, ?)", [
+            _row("1001", descripcion="Limpia"),
+            _row("1001\u00a0", descripcion="Sucia", cliente="VIEJO"),
+            _row(" 1002\u00a0", descripcion="Primera"),
+            _row("1002\u00a0", descripcion="Última"),
+            _row("1003\u00a0", descripcion="Única", fecha=""),
+        ])
+        conn.commit()
+        conn.close()
+
+        db.init_db(self.db_path)
+
+        self.assertEqual(
+            self._query("SELECT OT, Descripción FROM maximo ORDER BY OT"),
+            [("1001", "Limpia"), ("1002", "Última"), ("1003", "Única")],
+        )
+        self.assertEqual(self._query("PRAGMA user_version"), [(db.OTS_NORMALIZED_USER_VERSION,)])
+        self.assertEqual(db.get_lookup_values("Cliente", db_path=self.db_path), ["ACME"])
+        self.assertEqual(self._ots(filter_text="última", search_by="Descripción"), ["1002"])
+        self.assertEqual(self._query("SELECT Fecha_dia FROM maximo WHERE OT = '1003'"), [(0,)])
+
+        # El merge encuentra las OT por la clave primaria
+        result = self._merge([_row("1003", descripcion="Única", fecha="")])
+        self.assertFalse(result.changed)
+
+
+class SearchTest(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        self._merge([
+            _row("1001", descripcion="Bomba de agua", serie="SN-0001"),
+            _row("1002", descripcion="Reparación compresor", serie="SN-0002"),
+            _row("1003", descripcion="Bomba de vacío", serie="AB-7"),
+        ])
+        self.manager = db.get_manager(self.db_path)
+
+    def _uses_fts(self, text: str, search_by: str) -> bool:
+        return db._search_clause(self.manager, text, search_by, "Todos")[3]
+
+    def test_long_words_use_fts_and_short_ones_like(self):
+        if not self.manager.fts_enabled:
+            self.skipTest("SQLite sin FTS5 trigram")
+        self.assertTrue(self._uses_fts("bomba", "Descripción"))
+        self.assertFalse(self._uses_fts("de ab", "Descripción"))
+
+        self.assertEqual(self._ots(filter_text="BOMBA", search_by="Descripción"), ["1001", "1003"])
+        self.assertEqual(self._ots(filter_text="bom va", search_by="Descripción"), ["1003"])
+        self.assertEqual(self._ots(filter_text="ón", search_by="Descripción"), ["1002"])
+        self.assertEqual(self._ots(filter_text="reparación", search_by="Descripción"), ["1002"])
+
+    def test_accented_column_names(self):
+        self.assertEqual(self._ots(filter_text="sn-000", search_by="Nº_de_serie"), ["1001", "1002"])
+        self.assertEqual(self._ots(filter_text="ab", search_by="Nº_de_serie"), ["1003"])
+        self.assertEqual(db.count_data("compresor", "Descripción", "Todos", db_path=self.db_path), 1)
+        with self.assertRaises(ValueError):
+            self._ots(filter_text="x", search_by="Cliente")
+
+
+class FechaTest(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        # 10 OT, una de cada tres sin fecha
+        self._merge([
+            _row(str(100 + n), fecha="" if n % 3 == 0 else f"2025-03-{n + 1:02d}",
+                 cliente="C1" if n % 2 else "C2")
+            for n in range(10)
+        ])
+
+    def _pages(self, descending: bool, page_size: int = 3) -> list:
+        pager = db.QueryPager(page_size, filter_text="", search_by="OT", client_filter="Todos",
+                              order_by="Fecha", descending=descending, db_path=self.db_path)
+        return [r[0] for start in range(0, 12, page_size) for r in pager(start, page_size)]
+
+    def test_keyset_paging_keeps_undated_rows(self):
+        undated = ["100", "103", "106", "109"]
+        dated = ["101", "102", "104", "105", "107", "108"]
+
+        self.assertEqual(self._pages(descending=False), undated + dated)
+        self.assertEqual(self._pages(descending=True), dated[::-1] + undated[::-1])
+        self.assertEqual(self._ots("Fecha", after="103", limit=3), ["106", "109", "101"])
+        self.assertEqual(self._ots("Fecha", after="101", descending=True), undated[::-1])
+
+    def test_date_range_is_inclusive_and_skips_undated(self):
+        self.assertEqual(self._ots("Fecha", date_from="2025-03-02", date_to="2025-03-05"),
+                         ["101", "102", "104"])
+        self.assertEqual(self._ots("Fecha", date_to=date(2025, 3, 3)), ["101", "102"])
+        self.assertEqual(self._ots("Fecha", date_from="2025-03-08"), ["107", "108"])
+        self.assertEqual(self._ots("Fecha", client_filter="C1", date_to="2025-03-09"),
+                         ["101", "105", "107"])
+        self.assertEqual(db.count_data("", "OT", "Todos", date_to="2025-03-31", db_path=self.db_path), 6)
+        with self.assertRaises(ValueError):
+            self._ots("Fecha", date_from="03/03/2025")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+# tests/test_export_parser.py
+"""
+Parser en streaming del export de Maximo (HTML con extensión .xls): columnas
+por cabecera, posiciones fijas si no se reconoce, fechas, NBSP y filas cortas.
+
+    python -m unittest tests.test_export_parser
+"""
+import os
+import tempfile
+import unittest
+
+from export_parser import LEGACY_POSITIONS, iter_export_rows
+
+TITLE_ROW = '<tr><th colspan="16">Órdenes de trabajo</th></tr>'
+
+
+def _tr(cells, tag="td") -> str:
+    return "<tr>" + "".join(f"<{tag}>{c}</{tag}>" for c in cells) + "</tr>"
+
+
+def _legacy_cells(ot, descripcion, serie, fecha, cliente, tipo, seguimiento, planta) -> list:
+    """16 celdas con cada valor en su posición de LEGACY_POSITIONS."""
+    cells = [""] * 16
+    values = (ot, descripcion, serie, fecha, cliente, tipo, seguimiento, planta)
+    for position, value in zip(LEGACY_POSITIONS, values):
+        cells[position] = value
+    return cells
+
+
+class ExportParserTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _parse(self, *rows, extra: str = "") -> list:
+        path = os.path.join(self._tmp.name, "export.xls")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('<html><head><meta charset="utf-8"></head><body>\n<table>\n')
+            f.write("\n".join(rows))
+            f.write("\n</table>\n" + extra + "</body></html>\n")
+        return list(iter_export_rows(path))
+
+    def test_columns_by_header_in_any_order(self):
+        header = _tr(["Planta", "Fecha de notificación", "OT", "Cliente", "N° de serie",
+                      "Seguimiento", "Descripcion", "Tipo de trabajo", "Estado"], tag="th")
+        row = _tr(["LAB-BAD", "05/03/25 14:30:00", "1001", "ACME", "SN1",
+                   "PENDIENTE", "Bomba <b>URGENTE</b>", "CM", "APPR"])
+
+        rows = self._parse(TITLE_ROW, header, row)
+
+        self.assertEqual(rows, [
+            ("1001", "Bomba URGENTE", "SN1", "2025-03-05", "ACME", "CM", "PENDIENTE", "LAB-BAD"),
+        ])
+
+    def test_legacy_positions_when_header_is_unknown(self):
+        header = _tr([f"Columna {n}" for n in range(16)], tag="th")
+        rows = [
+            _tr(_legacy_cells(str(1000 + n), f"Reparación {n}", f"SN{n}", "01/02/24 08:00:00",
+                              "ACME", "CM", "PENDIENTE", "LAB-MAD"))
+            for n in range(4)
+        ]
+
+        parsed = self._parse(TITLE_ROW, header, *rows)
+
+        self.assertEqual([r[0] for r in parsed], ["1000", "1001", "1002", "1003"])
+        self.assertEqual(parsed[2], ("1002", "Reparación 2", "SN2", "2024-02-01",
+                                     "ACME", "CM", "PENDIENTE", "LAB-MAD"))
+
+    def test_short_export_without_header(self):
+        row = _tr(_legacy_cells("1000", "Única", "SN", "01/02/24 08:00:00", "C", "CM", "P", "LAB"))
+
+        parsed = self._parse(TITLE_ROW, _tr(["x"] * 16, tag="th"), row)
+
+        self.assertEqual([r[0] for r in parsed], ["1000"])
+
+    def test_dates(self):
+        header = _tr(["OT", "Descripción", "Nº de serie", "Fecha", "Cliente",
+                      "Tipo de trabajo", "Seguimiento", "Planta"], tag="th")
+        dates = {
+            "1": "05/03/25 14:30:00",
+            "2": "01/01/70 00:00:00",  # mismo pivote que %y
+            "3": "31/02/25 10:00:00",  # no existe
+            "4": "2025-03-05",         # otro formato
+            "5": "",
+        }
+        rows = [_tr([ot, "d", "s", value, "c", "t", "e", "p"]) for ot, value in dates.items()]
+
+        parsed = {r[0]: r[3] for r in self._parse(header, *rows)}
+
+        self.assertEqual(parsed, {"1": "2025-03-05", "2": "1970-01-01", "3": None, "4": None, "5": None})
+
+    def test_nbsp_and_spaces_are_stripped(self):
+        header = _tr(["OT", "Descripción", "Nº&nbsp;de serie", "Fecha", "Cliente",
+                      "Tipo de trabajo", "Seguimiento", "Planta"], tag="th")
+        row = _tr(["&nbsp; 1001&nbsp;", " Bomba&nbsp;&nbsp;averiada ", "SN&nbsp;1", "",
+                   "CLIENTE&nbsp; 1 S.A.", "CM", "PENDIENTE", "LAB-BAD"])
+
+        rows = self._parse(header, row)
+
+        self.assertEqual(rows[0][:5], ("1001", "Bomba averiada", "SN 1", None, "CLIENTE 1 S.A."))
+
+    def test_short_and_empty_rows(self):
+        header = _tr(["OT", "Descripción", "Nº de serie", "Fecha", "Cliente",
+                      "Tipo de trabajo", "Seguimiento", "Planta"], tag="th")
+        rows = [
+            _tr(["1001", "Sin más columnas"]),
+            _tr(["", "Total", "", "", "", "", "", ""]),  # fila de totales: sin OT
+            _tr(["&nbsp;"]),
+        ]
+
+        parsed = self._parse(header, *rows)
+
+        self.assertEqual(parsed, [("1001", "Sin más columnas", "", None, "", "", "", "")])
+
+    def test_only_first_table(self):
+        header = _tr(["OT", "Descripción", "Nº de serie", "Fecha", "Cliente",
+                      "Tipo de trabajo", "Seguimiento", "Planta"], tag="th")
+        other = "<table>" + _tr(["9999", "otra tabla", "", "", "", "", "", ""]) + "</table>\n"
+
+        parsed = self._parse(header, _tr(["1001", "d", "s", "", "c", "t", "e", "p"]), extra=other)
+
+        self.assertEqual([r[0] for r in parsed], ["1001"])
+
+
+if __name__ == "__main__":
+    unittest.main()
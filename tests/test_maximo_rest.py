@@ -0,0 +1,197 @@
+# tests/test_maximo_rest.py
+"""
+Backend REST contra un Maximo de mentira (http.server local) que sirve JSON
+paginado: paginación por responseInfo.nextPage, nuevo login tras un 401,
+contadores del merge, oslc.where incremental con la marca de agua y login
+rechazado.
+
+    python -m unittest tests.test_maximo_rest
+"""
+import base64
+import json
+import re
+import tempfile
+import threading
+import unittest
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+import db
+from maximo_rest import STATE_WATERMARK, run_rest_update
+
+USERNAME, PASSWORD = "usuario", "secreto"
+
+
+def _record(n: int, changedate: str, description: str = None) -> dict:
+    return {
+        "wonum": str(1000 + n),
+        "description": description or f"Reparación {n}",
+        "assetnum": f"SN{n:04d}",
+        "reportdate": f"2025-03-{n + 1:02d}T10:00:00+01:00",
+        "pluscustomer": f"CLIENTE {n % 2}",
+        "worktype": "REP",
+        "status": "PENDIENTE",
+        "location": "LAB-BAD",
+        "changedate": changedate,
+    }
+
+
+class FakeMaximo(ThreadingHTTPServer):
+    """Object structure mxwo paginado, con sesión por cookie."""
+
+    daemon_threads = True
+
+    def __init__(self, records: list):
+        super().__init__(("127.0.0.1", 0), FakeMaximoHandler)
+        self.records = records
+        self.sessions = set()
+        self.logins = 0
+        self.pages_served = 0
+        self.wheres = []
+        # Tras servir esta página se invalidan las sesiones (sesión caducada)
+        self.expire_after_page = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/maximo/"
+
+
+class FakeMaximoHandler(BaseHTTPRequestHandler):
+    server: FakeMaximo
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        if url.path == "/maximo/oslc/login":
+            self._login()
+        elif url.path == "/maximo/oslc/os/mxwo":
+            self._page(params)
+        else:
+            self._send(404, {})
+
+    def _login(self):
+        expected = base64.b64encode(f"{USERNAME}:{PASSWORD}".encode()).decode()
+        if self.headers.get("maxauth") != expected:
+            self._send(401, {"Error": "BMXAA0021E"})
+            return
+        self.server.logins += 1
+        session = f"s{self.server.logins}"
+        self.server.sessions.add(session)
+        self._send(200, {}, cookie=f"JSESSIONID={session}; Path=/")
+
+    def _page(self, params: dict):
+        cookie = self.headers.get("Cookie", "")
+        if not any(f"JSESSIONID={s}" in cookie for s in self.server.sessions):
+            self._send(401, {"Error": "BMXAA0021E"})
+            return
+        where = params.get("oslc.where", "")
+        self.server.wheres.append(where)
+        records = self.server.records
+        since = re.search(r'changedate>="([^"]+)"', where)
+        if since:
+            records = [r for r in records if r["changedate"] >= since.group(1)]
+
+        page_size = int(params["oslc.pageSize"])
+        page = int(params.get("pageno", "1"))
+        body = {"member": records[(page - 1) * page_size:page * page_size], "responseInfo": {}}
+        if page * page_size < len(records):
+            query = urllib.parse.urlencode({**params, "pageno": str(page + 1)})
+            body["responseInfo"]["nextPage"] = {"href": f"{self.server.base_url}oslc/os/mxwo?{query}"}
+        self.server.pages_served += 1
+        if self.server.expire_after_page == self.server.pages_served:
+            self.server.sessions.clear()
+        self._send(200, body)
+
+    def _send(self, status: int, body: dict, cookie: str = None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if cookie:
+            self.send_header("Set-Cookie", cookie)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RestBackendTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.server = FakeMaximo([_record(n, f"2025-03-0{n + 1}T12:00:00+01:00") for n in range(5)])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        # Configuración y BD propias del test
+        self._saved_store = config._store
+        config._store = config.ConfigStore(f"{self._tmp.name}/config.json")
+        self.cfg = config.AppConfig(
+            maximo_url=self.server.base_url,
+            username=USERNAME,
+            password=PASSWORD,
+            db_path=f"{self._tmp.name}/maximo_data.db",
+            metrics_enabled=False,
+            rest_page_size=2,
+        )
+        config.save_config(self.cfg)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        db.close_all()
+        config._store = self._saved_store
+        self._tmp.cleanup()
+
+    def _ots(self) -> dict:
+        rows = db.fetch_data("", "OT", "Todos", order_by="OT", db_path=self.cfg.db_path)
+        return {row[0]: row for row in rows}
+
+    def test_full_sync_follows_next_page_and_merges(self):
+        result = run_rest_update(self.cfg)
+
+        self.assertEqual(self.server.pages_served, 3)  # 5 registros de 2 en 2
+        self.assertEqual((result.new_entries, result.updated_entries), (5, 0))
+        ots = self._ots()
+        self.assertEqual(sorted(ots), [str(1000 + n) for n in range(5)])
+        self.assertEqual(ots["1000"][3], "2025-03-01")  # Fecha ISO recortada al día
+        self.assertEqual(self.server.wheres[0], 'location="LAB-BAD"')
+        self.assertEqual(db.get_sync_state(STATE_WATERMARK, db_path=self.cfg.db_path),
+                         "2025-03-05T12:00:00+01:00")
+
+    def test_relogin_after_401(self):
+        self.server.expire_after_page = 1
+
+        result = run_rest_update(self.cfg)
+
+        self.assertEqual(self.server.logins, 2)
+        self.assertEqual(result.new_entries, 5)
+        self.assertEqual(len(self._ots()), 5)
+
+    def test_delta_sync_uses_watermark(self):
+        run_rest_update(self.cfg)
+        self.server.records[4] = _record(4, "2025-03-07T09:00:00+01:00", description="Cambiada")
+        self.server.records.append(_record(5, "2025-03-08T09:00:00+01:00"))
+        self.server.wheres.clear()
+
+        result = run_rest_update(self.cfg)
+
+        self.assertEqual(
+            self.server.wheres[0],
+            'location="LAB-BAD" and changedate>="2025-03-05T12:00:00+01:00"',
+        )
+        self.assertEqual((result.new_entries, result.updated_entries), (1, 1))
+        self.assertEqual(result.updated_ots, ("1004",))
+        self.assertEqual(self._ots()["1004"][1], "Cambiada")
+        self.assertEqual(db.get_sync_state(STATE_WATERMARK, db_path=self.cfg.db_path),
+                         "2025-03-08T09:00:00+01:00")
+
+    def test_rejected_login(self):
+        self.cfg.password = "otra"
+
+        with self.assertRaisesRegex(RuntimeError, "Login rechazado"):
+            run_rest_update(self.cfg)
+
+
+if __name__ == "__main__":
+    unittest.main()
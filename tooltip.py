@@ -0,0 +1,53 @@
+# tooltip.py
+import tkinter as tk
+from typing import Callable, Optional
+
+
+class Tooltip:
+    """
+    Tooltip simple para un widget Tk. El texto se pide a get_text() cada vez
+    que se muestra, así refleja siempre el estado actual (None/"" = no mostrar).
+    """
+
+    DELAY_MS = 500
+
+    def __init__(self, widget, get_text: Callable[[], Optional[str]]):
+        self.widget = widget
+        self.get_text = get_text
+        self._job = None
+        self._window: Optional[tk.Toplevel] = None
+        widget.bind("<Enter>", self._schedule, add="+")
+        widget.bind("<Leave>", self._hide, add="+")
+        widget.bind("<ButtonPress>", self._hide, add="+")
+
+    def _schedule(self, event=None):
+        self._cancel()
+        self._job = self.widget.after(self.DELAY_MS, self._show)
+
+    def _cancel(self):
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _show(self):
+        self._job = None
+        text = self.get_text()
+        if not text:
+            return
+        x = self.widget.winfo_pointerx() + 12
+        y = self.widget.winfo_pointery() + 12
+        self._window = tw = tk.Toplevel(self.widget)
+        tw.wm_overrideredirect(True)
+        label = tk.Label(tw, text=text, justify="left", background="#ffffe0",
+                         relief="solid", borderwidth=1, font=("Consolas", 9))
+        label.pack(ipadx=4, ipady=2)
+        tw.update_idletasks()
+        # Que no se salga por abajo (la barra de estado está al pie de la ventana)
+        y = min(y, tw.winfo_screenheight() - tw.winfo_reqheight() - 40)
+        tw.wm_geometry(f"+{x}+{y}")
+
+    def _hide(self, event=None):
+        self._cancel()
+        if self._window is not None:
+            self._window.destroy()
+            self._window = None
@@ -1,43 +1,81 @@
 # updater.py
-from maximo_client import (
-    setup_driver,
-    login,
-    open_workorders_app,
-    apply_filter,
-    download_file,
-    move_latest_file,
-    process_html_table,
-)
-from db import update_database_from_df
+from config import load_config
+from db import MergeResult, combine_results
+from maximo_rest import run_rest_update
+from sync_metrics import current_trace, trace_sync, use_trace
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
-import tempfile
-import shutil
+import sys
 
 
 def run_update(headless=True):
-    profile_dir = tempfile.mkdtemp(prefix="maximo-update-")
-    logging.info(f"Updater: usando perfil temporal {profile_dir}")
-    driver = None
-    try:
-        driver = setup_driver(headless=headless, profile_dir=profile_dir)
-        login(driver)
-        open_workorders_app(driver)
-        apply_filter(driver)
-        download_file(driver)
-        file_path = move_latest_file()
-        if not file_path:
-            logging.warning("No se pudo mover el archivo descargado. Abortando actualización.")
-            return 0, 0
-        df = process_html_table(file_path)
-        new_entries, updated_entries = update_database_from_df(df)
-        logging.info("Actualización de base de datos completada.")
-        return new_entries, updated_entries
-    finally:
-        try:
-            if driver is not None:
-                driver.quit()
-        finally:
-            shutil.rmtree(profile_dir, ignore_errors=True)
-            logging.info(f"Updater: navegador cerrado y perfil {profile_dir} eliminado")
-
-        logging.info("Navegador cerrado.")
+    """
+    Sincroniza la BD con Maximo usando el backend de cfg.sync_backend.
+    Devuelve el MergeResult (contadores y OT nuevas/actualizadas/eliminadas).
+
+    Con selenium y varios perfiles de filtro, hasta cfg.sync_workers
+    navegadores exportan en paralelo y cada export se fusiona en cuanto llega.
+    """
+    cfg = load_config()
+    if cfg.sync_backend not in ("rest", "selenium"):
+        raise RuntimeError(f"Backend de sincronización desconocido: {cfg.sync_backend!r}")
+    with trace_sync(cfg.sync_backend) as trace:
+        if cfg.sync_backend == "rest":
+            result = run_rest_update(cfg)
+        else:
+            # Import diferido: selenium/lxml solo con el backend selenium
+            import selenium_sync
+
+            persistent = headless and cfg.persistent_sync_session
+
+            def sync_one(profile, stream):
+                if persistent:
+                    return selenium_sync.run_in_session(profile, stream)
+                return selenium_sync.run_selenium_update(headless=headless, profile=profile, stream=stream)
+
+            result = _sync_profiles(selenium_sync.filter_profiles(cfg), sync_one, cfg.sync_workers)
+        trace.result.update(new=result.new_entries, updated=result.updated_entries)
+    return result
+
+
+def _sync_profiles(profiles, sync_one, workers: int) -> MergeResult:
+    """
+    Un perfil: en este hilo, parseando el export a la vez que se fusiona.
+    Varios: un pool de como mucho `workers` hilos, cada uno con su navegador.
+    El parseo se hace fuera del merge para que solo este último se serialice
+    (lock del escritor de la BD) y el tiempo total se acerque al del perfil
+    más lento.
+    """
+    if len(profiles) == 1:
+        return sync_one(profiles[0], True)
+
+    trace = current_trace()
+    workers = max(1, min(workers, len(profiles)))
+    logging.info(f"Updater: {len(profiles)} perfiles con {workers} navegadores en paralelo")
+
+    def task(profile):
+        with use_trace(trace, profile=profile.name):
+            return sync_one(profile, False)
+
+    results, failed = [], []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync") as pool:
+        futures = {pool.submit(task, profile): profile for profile in profiles}
+        for future in as_completed(futures):
+            profile = futures[future]
+            try:
+                results.append(future.result())
+            except Exception:
+                logging.exception(f"Updater: error sincronizando el perfil {profile.name}")
+                failed.append(profile.name)
+    if failed:
+        # Los perfiles que sí han terminado ya están fusionados en la BD
+        raise RuntimeError(f"Error sincronizando los perfiles: {', '.join(failed)}")
+    return combine_results(results)
+
+
+def close_sync_session():
+    """Cierra los navegadores de sincronización, si existen (al salir de la app)."""
+    # Si nunca se ha sincronizado con selenium, no está cargado y no hay nada que cerrar
+    selenium_sync = sys.modules.get("selenium_sync")
+    if selenium_sync is not None:
+        selenium_sync.close_sync_sessions()
@@ -0,0 +1,313 @@
+# virtual_table.py
+from collections import OrderedDict
+from tkinter import ttk
+from typing import Callable, Dict, List, Optional, Sequence
+
+# fetch_page(inicio, cantidad) -> filas [inicio, inicio + cantidad)
+PageFetcher = Callable[[int, int], List[Sequence]]
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    Treeview "virtual" para listados grandes.
+
+    En Tk solo existen las filas que caben en pantalla; al hacer scroll se
+    reemplazan por las de la nueva ventana. Las filas se piden por páginas a
+    fetch_page y se guardan en una caché LRU de pocas páginas.
+
+    El id de cada item es la primera columna de la fila (la OT), así que
+    tree.selection() / tree.item() siguen funcionando como en un Treeview normal.
+    Al repintar solo se tocan los items que cambian (insertar, mover, actualizar
+    valores o borrar), así que refrescar tras una sincronización con pocos
+    cambios cuesta unas pocas operaciones de Tk.
+
+    Con page_runner (un live_search.SearchRunner propio) las páginas que no
+    están en caché se leen en su hilo: mientras tanto se pintan filas
+    "Cargando…" y, al llegar, se repinta. Solo cuenta la última petición, así
+    que un scroll largo aborta la lectura de las páginas que ya no se ven.
+    Sin page_runner se leen en el hilo de Tk.
+    """
+
+    DEFAULT_ROW_HEIGHT = 20
+    DEFAULT_HEADING_HEIGHT = 25
+    WHEEL_ROWS = 3
+    PLACEHOLDER_TEXT = "Cargando…"
+    # Prefijo del id de las filas "Cargando…" (no puede coincidir con una OT)
+    PLACEHOLDER_PREFIX = "\x00cargando-"
+
+    def __init__(self, master, columns: Sequence[str], page_size: int = 200,
+                 max_cached_pages: int = 20, page_runner=None, **tree_kw):
+        super().__init__(master)
+        self.page_size = page_size
+        self.max_cached_pages = max_cached_pages
+        self.page_runner = page_runner
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", **tree_kw)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self._total = 0
+        self._fetch_page: Optional[PageFetcher] = None
+        self._pages: "OrderedDict[int, List[Sequence]]" = OrderedDict()
+        self._offset = 0
+        self._selected_key: Optional[str] = None
+        self._rendering = False
+        # Valores pintados de cada item, para no reescribir los que no cambian
+        self._shown: Dict[str, tuple] = {}
+        # Páginas pedidas a page_runner y aún sin llegar; cambia con cada set_source
+        self._loading: frozenset = frozenset()
+        self._source_id = 0
+
+        self.tree.bind("<Configure>", lambda e: self._render())
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-self.WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(self.WHEEL_ROWS))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self._move_selection(-self._visible_count()))
+        self.tree.bind("<Next>", lambda e: self._move_selection(self._visible_count()))
+        self.tree.bind("<Home>", lambda e: self._move_selection(-self._total))
+        self.tree.bind("<End>", lambda e: self._move_selection(self._total))
+
+    # ---------- Origen de datos ----------
+    def set_source(self, total: int, fetch_page: PageFetcher, keep_position: bool = False,
+                   preload: Optional[Dict[int, List[Sequence]]] = None):
+        """
+        Cambia el origen de datos. Por defecto vuelve al principio del listado;
+        con keep_position=True mantiene el scroll (y la selección, si la fila sigue).
+        preload: páginas {índice: filas} ya leídas (p.ej. en segundo plano).
+        """
+        self._total = max(0, int(total))
+        self._fetch_page = fetch_page
+        self._pages.clear()
+        self._cancel_loading()
+        if preload:
+            self._pages.update(preload)
+        if not keep_position:
+            self._offset = 0
+        self._render()
+
+    def invalidate(self):
+        """Descarta la caché de páginas y repinta la ventana actual."""
+        self._pages.clear()
+        self._cancel_loading()
+        self._render()
+
+    def is_placeholder(self, iid: str) -> bool:
+        """True si el item es una fila "Cargando…" (página aún sin leer)."""
+        return iid.startswith(self.PLACEHOLDER_PREFIX)
+
+    @property
+    def total(self) -> int:
+        return self._total
+
+    def loaded_keys(self) -> set:
+        """Ids (primera columna) de las filas de las páginas ya leídas."""
+        return {str(row[0]) for page in self._pages.values() for row in page}
+
+    @property
+    def offset(self) -> int:
+        """Índice de la primera fila visible."""
+        return self._offset
+
+    def _store_page(self, index: int, page: List[Sequence]):
+        self._pages[index] = page
+        while len(self._pages) > self.max_cached_pages:
+            self._pages.popitem(last=False)
+
+    def _page(self, index: int) -> Optional[List[Sequence]]:
+        """Página de la caché; None si falta y se lee con page_runner."""
+        page = self._pages.get(index)
+        if page is not None:
+            self._pages.move_to_end(index)
+            return page
+        if self.page_runner is not None and self._fetch_page is not None:
+            return None
+        start = index * self.page_size
+        page = list(self._fetch_page(start, self.page_size)) if self._fetch_page else []
+        self._store_page(index, page)
+        return page
+
+    def _items(self, start: int, count: int) -> List[tuple]:
+        """Items [(iid, valores)] de las filas [start, start + count)."""
+        items = []
+        missing = []
+        end = min(start + count, self._total)
+        pos = start
+        while pos < end:
+            page_index, page_pos = divmod(pos, self.page_size)
+            page = self._page(page_index)
+            if page is None:
+                missing.append(page_index)
+                page_end = min(end, (page_index + 1) * self.page_size)
+                items.extend(self._placeholder(p) for p in range(pos, page_end))
+                pos = page_end
+                continue
+            chunk = page[page_pos:page_pos + (end - pos)]
+            if not chunk:
+                break
+            items.extend((str(row[0]), tuple(row)) for row in chunk)
+            pos += len(chunk)
+        if missing:
+            self._load_pages(missing)
+        return items
+
+    def _placeholder(self, pos: int) -> tuple:
+        blanks = ("",) * (len(self.tree["columns"]) - 1)
+        return f"{self.PLACEHOLDER_PREFIX}{pos}", (self.PLACEHOLDER_TEXT,) + blanks
+
+    def _load_pages(self, missing: List[int]):
+        """Pide a page_runner las páginas que faltan (y la siguiente, ya que está)."""
+        wanted = list(missing)
+        following = missing[-1] + 1
+        if following * self.page_size < self._total and following not in self._pages:
+            wanted.append(following)
+        if frozenset(wanted) == self._loading:
+            return  # ya están pedidas
+        self._loading = frozenset(wanted)
+        fetch_page, source_id, page_size = self._fetch_page, self._source_id, self.page_size
+
+        def load():
+            # Hilo de page_runner
+            return {index: list(fetch_page(index * page_size, page_size)) for index in wanted}
+
+        def loaded(pages):
+            if source_id != self._source_id:
+                return  # páginas de un origen de datos anterior
+            self._loading = frozenset()
+            for index, page in pages.items():
+                self._store_page(index, page)
+            self._render()
+
+        self.page_runner.submit(load, loaded)
+
+    def _cancel_loading(self):
+        self._source_id += 1
+        self._loading = frozenset()
+        if self.page_runner is not None:
+            self.page_runner.cancel()
+
+    # ---------- Pintado ----------
+    def _visible_count(self) -> int:
+        height = self.tree.winfo_height()
+        children = self.tree.get_children()
+        bbox = self.tree.bbox(children[0]) if children else None
+        if bbox:
+            top, row_height = bbox[1], bbox[3]
+        else:
+            style = ttk.Style(self)
+            row_height = int(style.lookup("Treeview", "rowheight") or 0) or self.DEFAULT_ROW_HEIGHT
+            top = self.DEFAULT_HEADING_HEIGHT
+        return max(1, (height - top) // max(1, row_height))
+
+    def _clamp_offset(self, offset: int) -> int:
+        return max(0, min(offset, self._total - self._visible_count()))
+
+    def _render(self):
+        if self._rendering:
+            return
+        self._rendering = True
+        try:
+            visible = self._visible_count()
+            self._offset = self._clamp_offset(self._offset)
+            self._patch_items(self._items(self._offset, visible))
+
+            if (self._selected_key is not None and self.tree.exists(self._selected_key)
+                    and self.tree.selection() != (self._selected_key,)):
+                self.tree.selection_set(self._selected_key)
+
+            if self._total:
+                first = self._offset / self._total
+                last = min(1.0, (self._offset + visible) / self._total)
+            else:
+                first, last = 0.0, 1.0
+            self.scrollbar.set(first, last)
+        finally:
+            self._rendering = False
+
+    def _patch_items(self, wanted: List[tuple]):
+        """Deja en el Treeview exactamente los items wanted [(iid, valores)], en orden."""
+        keep = {iid for iid, _ in wanted}
+        current = list(self.tree.get_children())
+        stale = [iid for iid in current if iid not in keep]
+        if stale:
+            self.tree.delete(*stale)
+            for iid in stale:
+                self._shown.pop(iid, None)
+            current = [iid for iid in current if iid in keep]
+
+        present = set(current)
+        for index, (iid, values) in enumerate(wanted):
+            if iid not in present:
+                self.tree.insert("", index, iid=iid, values=values)
+                current.insert(index, iid)
+                present.add(iid)
+                self._shown[iid] = values
+                continue
+            if current[index] != iid:
+                self.tree.move(iid, "", index)
+                current.remove(iid)
+                current.insert(index, iid)
+            if self._shown.get(iid) != values:
+                self.tree.item(iid, values=values)
+                self._shown[iid] = values
+
+    # ---------- Scroll ----------
+    def scroll_rows(self, delta: int):
+        new_offset = self._clamp_offset(self._offset + delta)
+        if new_offset != self._offset:
+            self._offset = new_offset
+            self._render()
+        return "break"
+
+    def scroll_to_index(self, index: int):
+        """Hace visible la fila index (absoluta) si no lo está ya."""
+        visible = self._visible_count()
+        if index < self._offset:
+            self.scroll_rows(index - self._offset)
+        elif index >= self._offset + visible:
+            self.scroll_rows(index - (self._offset + visible - 1))
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self._offset = self._clamp_offset(int(float(args[0]) * self._total))
+            self._render()
+        elif action == "scroll":
+            amount, unit = int(args[0]), args[1]
+            step = self._visible_count() if unit == "pages" else 1
+            self.scroll_rows(amount * step)
+
+    def _on_mousewheel(self, event):
+        notches = -int(event.delta / 120) if abs(event.delta) >= 120 else (-1 if event.delta > 0 else 1)
+        return self.scroll_rows(notches * self.WHEEL_ROWS)
+
+    # ---------- Selección ----------
+    def _on_select(self, event=None):
+        if self._rendering:
+            return
+        # Al borrar filas que salen de la ventana Tk vacía la selección:
+        # eso no cuenta como deseleccionar, la fila sigue seleccionada.
+        selected = self.tree.selection()
+        if selected:
+            self._selected_key = selected[0]
+
+    def _move_selection(self, delta: int):
+        if not self._total:
+            return "break"
+        children = self.tree.get_children()
+        if self._selected_key in children:
+            current = self._offset + children.index(self._selected_key)
+        else:
+            current = self._offset - (1 if delta > 0 else -1)
+        target = max(0, min(self._total - 1, current + delta))
+
+        self.scroll_to_index(target)
+        children = self.tree.get_children()
+        slot = target - self._offset
+        if 0 <= slot < len(children):
+            self._selected_key = children[slot]
+            self.tree.selection_set(self._selected_key)
+            self.tree.focus(self._selected_key)
+        return "break"